@@ -0,0 +1,306 @@
+"""
+Suite de carga de la API: siembra la base con volúmenes configurables,
+levanta el servidor y recorre cada ruta de src/app.py con un generador HTTP
+local a concurrencia fija. Por escenario reporta throughput, p50/p95/p99,
+consultas SQL por request (cabecera X-Query-Count) y RSS del servidor, y
+guarda todo en un JSON para comparar entre commits.
+
+    $ python benchmarks/bench_api.py --output before.json
+    $ git checkout otra-rama
+    $ python benchmarks/bench_api.py --output after.json --compare before.json
+
+    # volúmenes grandes (la siembra de SQLite queda en una plantilla reutilizable)
+    $ python benchmarks/bench_api.py --users 10000 --entities 100000 --favorites 10000000
+
+Sin DATABASE_URL se siembra una plantilla SQLite por combinación de volúmenes
+y cada corrida trabaja sobre una copia, así los escenarios de escritura y
+borrado empiezan siempre desde el mismo estado. Con DATABASE_URL la base se
+usa tal cual y se modifica: conviene una base descartable.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from loadgen import run_load, wait_until_up  # noqa: E402
+
+SKIPPED_RULES = ("/static", "/admin")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--entities", type=int, default=10000, help="filas de people, planets y species (cada una)")
+    parser.add_argument("--favorites", type=int, default=100000, help="filas de favoritos en total")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5, help="segundos por escenario")
+    parser.add_argument("--server", choices=["gunicorn", "uvicorn"], default="gunicorn")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--only", nargs="*", help="solo los escenarios cuyo nombre contenga alguno de estos textos")
+    parser.add_argument("--output", help="archivo JSON de resultados")
+    parser.add_argument("--compare", help="JSON de una corrida anterior para mostrar la diferencia")
+    return parser.parse_args()
+
+
+def prepare_database(args):
+    """Siembra (o reutiliza) la base y devuelve (DATABASE_URL para el servidor, segundos de siembra)"""
+    if os.environ.get("DATABASE_URL"):
+        url, template = os.environ["DATABASE_URL"], None
+    else:
+        # la plantilla se rehace cuando cambia el esquema de los modelos
+        from sqlalchemy.schema import CreateTable
+        from models import db
+        ddl = "".join(str(CreateTable(table)) for table in db.metadata.sorted_tables)
+        schema = hashlib.md5(ddl.encode()).hexdigest()[:8]
+        template = os.path.join(
+            tempfile.gettempdir(), f"bench_api-{args.users}-{args.entities}-{args.favorites}-{schema}.db"
+        )
+        url = f"sqlite:///{template}"
+        os.environ["DATABASE_URL"] = url
+
+    from app import app
+    from seed import seed
+    from search import ensure_sqlite_index
+    from models import db
+    with app.app_context():
+        seconds = seed(args.users, args.entities, args.favorites)
+        if db.engine.dialect.name == "sqlite":
+            ensure_sqlite_index(db.engine)
+        db.engine.dispose()
+
+    if template is None:
+        return url, seconds
+    work = os.path.join(tempfile.gettempdir(), "bench_api-run.db")
+    shutil.copy(template, work)
+    return f"sqlite:///{work}", seconds
+
+
+# reglas de escritura por tipo, tal cual están en app.py
+WRITE_RULES = {
+    "planets": {"create": "/planet", "put": "/planet/<int:planet_id>", "delete": "/planet/<int:planet_id>",
+                "favorite_post": "/favorite/planet/<int:planet_id>",
+                "favorite_delete": "/favorite/planet/<int:planet_id>"},
+    "species": {"create": "/species", "put": "/species/<int:species_id>", "delete": "/species/<int:species_id>",
+                "favorite_post": "/favorite/species/<int:species_id>",
+                "favorite_delete": "/favorite/species/<int:species_id>"},
+    "people": {"create": "/people", "put": "/people/<int:person_id>", "delete": "/people/<int:people_id>",
+               "favorite_post": "/favorite/people/<int:people_id>",
+               "favorite_delete": "/favorite/people/<int:person_id>"},
+}
+
+
+def path_for(rule, value):
+    return re.sub(r"<[^>]+>", str(value), rule)
+
+
+def with_body(method, path, payload):
+    return (method, path, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+
+def get(paths):
+    return [("GET", path) for path in paths]
+
+
+def scenarios(args):
+    """[(método, regla de Flask, requests)] con requests en el formato de loadgen"""
+    from seed import planet_row, person_row, species_row, scratch_ids
+    rng = random.Random(42)
+    entities, users = args.entities, args.users
+    scratch = scratch_ids(entities)
+    ids = [rng.randint(1, entities) for _ in range(500)]
+    user_ids = [rng.randint(1, users) for _ in range(500)]
+    pairs = [(rng.randint(1, users), entity) for entity in scratch]
+    rows = {"planets": planet_row, "people": person_row, "species": species_row}
+
+    result = [
+        ("GET", "/", get(["/"])),
+        ("GET", "/cache/stats", get(["/cache/stats"])),
+        ("GET", "/db/pool", get(["/db/pool"])),
+        ("GET", "/metrics", get(["/metrics"])),
+        ("GET", "/search", get([f"/search?q=Planet+{i}" for i in ids[:50]] + ["/search?q=person&kinds=people"])),
+        ("GET", "/autocomplete", get([f"/autocomplete?prefix=pl+{str(i)[:2]}" for i in ids[:50]])),
+        ("GET", "/users", get(["/users?limit=20", "/users?limit=50"])),
+        ("GET", "/users/favorites/<int:id>", get([f"/users/favorites/{user}" for user in user_ids])),
+        ("GET", "/favorites/top", get([f"/favorites/top?kind={kind}&limit={limit}"
+                                       for kind in ("planets", "species", "people") for limit in (10, 100)])),
+        ("GET", "/images/<kind>", get([f"/images/{kind}?ids={','.join(map(str, ids[start:start + 50]))}"
+                                       for kind in ("planets", "species", "people") for start in range(0, 500, 50)])),
+    ]
+    for method in ("POST", "DELETE"):
+        result.append((method, "/favorites/bulk", [
+            with_body(method, "/favorites/bulk", {"items": [
+                {"user_id": user, "kind": "planets", "id": entity} for user, entity in pairs[start:start + 50]
+            ]})
+            for start in range(0, len(pairs), 50)
+        ]))
+    for kind, rules in WRITE_RULES.items():
+        result += [
+            ("GET", f"/{kind}", get([f"/{kind}?limit=50", f"/{kind}?limit=50&fans=count",
+                                     f"/{kind}?limit=20&sort=-name", f"/{kind}?limit=50&fields=id,name",
+                                     f"/{kind}?limit=50&images=1"])),
+            ("GET", f"/{kind}/<int:id>", get([f"/{kind}/{entity}" for entity in ids])),
+            ("POST", rules["favorite_post"], [
+                with_body("POST", path_for(rules["favorite_post"], entity), {"user_id": user}) for user, entity in pairs
+            ]),
+            ("DELETE", rules["favorite_delete"], [
+                with_body("DELETE", path_for(rules["favorite_delete"], entity), {"user_id": user}) for user, entity in pairs
+            ]),
+            ("POST", rules["create"], [with_body("POST", rules["create"], rows[kind](entities + i)) for i in range(100)]),
+            ("POST", f"/{kind}/bulk", [with_body("POST", f"/{kind}/bulk", [rows[kind](entities + i) for i in range(100)])]),
+            ("PUT", rules["put"], [with_body("PUT", path_for(rules["put"], entity), rows[kind](entity)) for entity in scratch]),
+            # PUT y PATCH comparten la regla
+            ("PATCH", rules["put"], [
+                with_body("PATCH", path_for(rules["put"], entity), {"name": f"Patched {entity}"}) for entity in scratch
+            ]),
+        ]
+    # los borrados al final: dejan vacío el rango scratch (la mitad de a uno, la otra en bloques)
+    half = len(scratch) // 2
+    for kind, rules in WRITE_RULES.items():
+        result.append(("DELETE", rules["delete"], [
+            ("DELETE", path_for(rules["delete"], entity)) for entity in scratch[:half]
+        ]))
+        result.append(("DELETE", f"/{kind}", [
+            ("DELETE", f"/{kind}?ids={','.join(map(str, scratch[start:start + 50]))}")
+            for start in range(half, len(scratch), 50)
+        ]))
+    return result
+
+
+def rss_mb(pid):
+    """RSS del proceso y sus hijos (workers), leído de /proc"""
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/status") as status:
+                for line in status:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as children:
+                    pending += [int(child) for child in children.read().split()]
+        except (FileNotFoundError, ProcessLookupError):
+            continue
+    return round(total / 1024, 1)
+
+
+def server_command(args, port):
+    if args.server == "uvicorn":
+        return ["uvicorn", "asgi:app", "--app-dir", "src", "--port", str(port),
+                "--log-level", "warning", "--no-access-log"]
+    return ["gunicorn", "wsgi", "--chdir", "src", "-w", str(args.workers), "-b", f"127.0.0.1:{port}",
+            "--log-level", "warning"]
+
+
+def check_coverage(planned):
+    """Avisa de rutas de app.py sin escenario (p. ej. rutas nuevas)"""
+    from app import app
+    covered = {(method, rule) for method, rule, _ in planned}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        if rule.rule.startswith(SKIPPED_RULES):
+            continue
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (method, rule.rule) not in covered:
+                missing.append(f"{method} {rule.rule}")
+    if missing:
+        print("rutas sin escenario:", ", ".join(missing), file=sys.stderr)
+    return missing
+
+
+def run_scenarios(args, url, planned):
+    port = 8790
+    env = dict(os.environ, DATABASE_URL=url, QUERY_COUNT_HEADER="1")
+    process = subprocess.Popen(server_command(args, port), cwd=ROOT, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    results = {}
+    try:
+        if not asyncio.run(wait_until_up(base_url)):
+            raise RuntimeError("el servidor no arrancó")
+        warmup = [request for method, _, requests in planned if method == "GET" for request in requests[:5]]
+        run_load(base_url, warmup, concurrency=4, duration=1)
+        for method, rule, requests in planned:
+            name = f"{method} {rule}"
+            if args.only and not any(text in name for text in args.only):
+                continue
+            statuses, queries = Counter(), []
+
+            def on_response(method, path, status, headers, data):
+                statuses[status] += 1
+                if "x-query-count" in headers:
+                    queries.append(int(headers["x-query-count"]))
+
+            stats = run_load(base_url, requests, args.concurrency, args.duration, on_response)
+            stats["statuses"] = {str(status): count for status, count in sorted(statuses.items())}
+            stats["queries_avg"] = round(sum(queries) / len(queries), 2) if queries else None
+            stats["queries_max"] = max(queries) if queries else None
+            stats["rss_mb"] = rss_mb(process.pid)
+            results[name] = stats
+            print(f"{name:<44}{stats['throughput_rps']:>9}{stats['p50_ms']:>9}{stats['p95_ms']:>9}"
+                  f"{stats['p99_ms']:>9}{str(stats['queries_avg']):>8}{stats['rss_mb']:>9}  {stats['statuses']}")
+    finally:
+        process.terminate()
+        process.wait()
+    return results
+
+
+def git_revision():
+    def git(*command):
+        return subprocess.run(["git", *command], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def compare(previous_path, results):
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)["scenarios"]
+    print(f"\n{'escenario':<44}{'req/s':>16}{'p99 ms':>18}")
+    for name, stats in results.items():
+        before = previous.get(name)
+        if not before or not before["throughput_rps"] or not before["p99_ms"] or stats["p99_ms"] is None:
+            continue
+        rps = (stats["throughput_rps"] / before["throughput_rps"] - 1) * 100
+        p99 = (stats["p99_ms"] / before["p99_ms"] - 1) * 100
+        print(f"{name:<44}{stats['throughput_rps']:>9} {rps:>+5.0f}%{stats['p99_ms']:>11} {p99:>+5.0f}%")
+
+
+def main():
+    args = parse_args()
+    url, seed_seconds = prepare_database(args)
+    planned = scenarios(args)
+    missing = check_coverage(planned)
+    print(f"{'escenario':<44}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'q/req':>8}{'RSS MB':>9}  status")
+    results = run_scenarios(args, url, planned)
+    report = {
+        **git_revision(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "users": args.users, "entities": args.entities, "favorites": args.favorites,
+            "concurrency": args.concurrency, "duration": args.duration,
+            "server": args.server, "workers": args.workers, "database": url.split("://")[0],
+        },
+        "seed_seconds": round(seed_seconds, 1),
+        "uncovered_routes": missing,
+        "scenarios": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.compare:
+        compare(args.compare, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Prueba de carga: el mismo conjunto de GET contra `gunicorn wsgi` (workers
+sync) y contra `uvicorn asgi:app` (un proceso, handlers async), a distintas
+concurrencias. Reporta throughput y p50/p95/p99 de cada servidor.
+
+    $ python benchmarks/bench_asgi.py --rows 10000 --concurrency 10 100 --duration 10
+    $ DATABASE_URL=postgresql://... python benchmarks/bench_asgi.py --wsgi-workers 4
+
+Sin DATABASE_URL usa un SQLite temporal. La caché de lectura se desactiva
+para que cada request llegue a la base.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.gettempdir(), 'bench_asgi.db')}")
+os.environ["CACHE_MAX_ENTRIES"] = "0"
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from app import app  # noqa: E402
+from seed import seed  # noqa: E402
+from loadgen import run_load, wait_until_up  # noqa: E402
+
+
+def paths(rows):
+    rng = random.Random(42)
+    mix = ["/planets?limit=50", "/people?limit=50&fans=count", "/species?sort=-name&limit=20",
+           "/users?limit=20", "/users/favorites/1"]
+    mix += [f"/{kind}/{rng.randint(1, rows)}" for kind in ("planets", "people", "species") for _ in range(5)]
+    return mix
+
+
+SERVERS = {
+    "gunicorn wsgi": lambda port, workers: [
+        "gunicorn", "wsgi", "--chdir", "src", "-w", str(workers), "-b", f"127.0.0.1:{port}", "--log-level", "warning",
+    ],
+    "uvicorn asgi": lambda port, workers: [
+        "uvicorn", "asgi:app", "--app-dir", "src", "--port", str(port), "--log-level", "warning", "--no-access-log",
+    ],
+}
+
+
+def bench(name, port, workers, mix, concurrencies, duration):
+    process = subprocess.Popen(SERVERS[name](port, workers), cwd=ROOT, env=os.environ.copy())
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        if not asyncio.run(wait_until_up(base_url)):
+            raise RuntimeError(f"{name} no arrancó")
+        run_load(base_url, mix, concurrency=4, duration=1)  # calentamiento
+        return {concurrency: run_load(base_url, mix, concurrency, duration) for concurrency in concurrencies}
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--wsgi-workers", type=int, default=4)
+    parser.add_argument("--output", help="escribe los resultados en este archivo JSON")
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(users=100, entities=args.rows, favorites=args.rows)
+
+    mix = paths(args.rows)
+    results = {}
+    for offset, name in enumerate(SERVERS):
+        results[name] = bench(name, 8700 + offset, args.wsgi_workers, mix, args.concurrency, args.duration)
+
+    print(f"{'servidor':<16}{'conc':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errores':>9}")
+    for name, by_concurrency in results.items():
+        for concurrency, stats in by_concurrency.items():
+            print(f"{name:<16}{concurrency:>6}{stats['throughput_rps']:>10}{stats['p50_ms']:>10}"
+                  f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['errors']:>9}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"rows": args.rows, "wsgi_workers": args.wsgi_workers, "results": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
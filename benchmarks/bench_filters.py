@@ -0,0 +1,96 @@
+"""
+Benchmark de filtros/orden del catálogo: mide list_page(Planets) con filtros
+a distintos tamaños de tabla, con y sin los índices (columna, id).
+Con índices el tiempo debe crecer de forma sub-lineal; sin ellos, lineal.
+
+    $ python benchmarks/bench_filters.py --rows 10000 100000 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_filters.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("CACHE_MAX_ENTRIES", "1")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import insert, func, select  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Planets  # noqa: E402
+from catalog import list_page  # noqa: E402
+
+CLIMATES = ["arid", "temperate", "frozen", "murky", "tropical"]
+
+QUERIES = [
+    ("climate=rare (1 de cada 1000)", "climate=rare&fans=none&limit=50"),
+    ("population rango + sort", "population__gte=500000&population__lt=510000&sort=population&fans=none&limit=50"),
+    ("name__prefix", "name__prefix=Planet 4242&fans=none&limit=50"),
+    ("sort=-population", "sort=-population&fans=none&limit=50"),
+]
+
+
+def seed(total):
+    current = db.session.execute(select(func.count()).select_from(Planets)).scalar()
+    batch = []
+    for i in range(current, total):
+        batch.append({
+            "name": f"Planet {i}", "description": "bench", "population": (i * 7919) % 1000000,
+            "climate": CLIMATES[i % len(CLIMATES)] if i % 1000 else "rare", "gravity": 1,
+            "diameter": i, "orbital_period": 1, "terrain": "desert", "rotation_period": 1,
+        })
+        if len(batch) == 50000:
+            db.session.execute(insert(Planets), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(Planets), batch)
+    db.session.commit()
+
+
+def run(query, repeat):
+    best = None
+    for _ in range(repeat):
+        with app.test_request_context(f"/planets?{query}"):
+            from flask import request
+            started = time.perf_counter()
+            list_page(Planets, request.args)
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def set_indexes(enabled):
+    for index in Planets.__table__.indexes:
+        if enabled:
+            index.create(db.engine, checkfirst=True)
+        else:
+            index.drop(db.engine, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    with app.app_context():
+        db.create_all()
+        print(f"{'filas':>9}  {'consulta':<32} {'con índice':>12} {'sin índice':>12}")
+        for total in sorted(args.rows):
+            seed(total)
+            timings = {}
+            for enabled in (True, False):
+                set_indexes(enabled)
+                for name, query in QUERIES:
+                    timings[(name, enabled)] = run(query, args.repeat)
+            set_indexes(True)
+            for name, _ in QUERIES:
+                print(f"{total:>9}  {name:<32} {timings[(name, True)] * 1000:9.2f} ms {timings[(name, False)] * 1000:9.2f} ms")
+    os.remove(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Microbenchmark de serialización: compara Planets.serialize() + json estándar
+con los serializadores generados (objetos del ORM y filas Core) + orjson.
+
+    $ python benchmarks/bench_serializers.py --rows 1000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from sqlalchemy import insert, select, delete  # noqa: E402
+from sqlalchemy.orm import selectinload  # noqa: E402
+from app import app  # noqa: E402
+from models import db, Planets  # noqa: E402
+from serializers import row_serializer, model_serializer, dumps, orjson  # noqa: E402
+
+
+def seed(count):
+    db.session.execute(delete(Planets))
+    db.session.execute(insert(Planets), [
+        {
+            "name": f"Planet {i}", "description": "A planet far, far away " * 4,
+            "population": i * 1000, "climate": "arid", "gravity": 1,
+            "diameter": 10000 + i, "orbital_period": 365, "terrain": "desert",
+            "rotation_period": 24,
+        }
+        for i in range(count)
+    ])
+    db.session.commit()
+
+
+def timed(fn):
+    db.session.expunge_all()
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+
+def orm_serialize():
+    planets = db.session.execute(select(Planets).options(selectinload(Planets.fans))).scalars().all()
+    json.dumps([planet.serialize() for planet in planets], sort_keys=True)
+
+
+def orm_compiled():
+    planets = db.session.execute(select(Planets)).scalars().all()
+    to_dict = model_serializer(Planets)
+    dumps([to_dict(planet) for planet in planets])
+
+
+def core_rows():
+    result = db.session.execute(select(*Planets.__table__.columns))
+    to_dict = row_serializer(tuple(result.keys()))
+    dumps([to_dict(row) for row in result])
+
+
+VARIANTS = [
+    ("Planets.serialize() + json", orm_serialize),
+    ("ORM + model_serializer + dumps", orm_compiled),
+    ("Core rows + row_serializer + dumps", core_rows),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"encoder: {'orjson' if orjson else 'json'}")
+    with app.app_context():
+        db.create_all()
+        for count in args.rows:
+            seed(count)
+            print(f"\n{count} filas")
+            baseline = None
+            for name, fn in VARIANTS:
+                best = min(timed(fn) for _ in range(args.repeat))
+                baseline = baseline or best
+                print(f"  {name:<36} {best * 1000:9.1f} ms  {count / best:12.0f} filas/s  x{baseline / best:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Generador de carga HTTP/1.1 mínimo (solo librería estándar): `concurrency`
+clientes con conexión keep-alive piden las rutas en rueda durante
+`duration` segundos y se mide la latencia de cada request.
+
+    from loadgen import run_load
+    stats = run_load("http://127.0.0.1:3000", ["/planets", "/people/1"], concurrency=50, duration=10)
+"""
+import asyncio
+import itertools
+import time
+from urllib.parse import urlsplit
+
+
+class Connection:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b"", headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("el servidor cerró la conexión")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+        if response_headers.get("transfer-encoding") == "chunked":
+            data = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                data += await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            data = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+        if response_headers.get("connection") == "close":
+            await self.close()
+        return status, response_headers, data
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(latencies, errors, elapsed, extra=None):
+    ms = [value * 1000 for value in latencies]
+    stats = {
+        "requests": len(ms),
+        "errors": errors,
+        "throughput_rps": round(len(ms) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ms, 0.50), 3) if ms else None,
+        "p95_ms": round(percentile(ms, 0.95), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 0.99), 3) if ms else None,
+        "max_ms": round(max(ms), 3) if ms else None,
+    }
+    stats.update(extra or {})
+    return stats
+
+
+async def _load(base_url, requests, concurrency, duration, on_response=None):
+    url = urlsplit(base_url)
+    rotation = itertools.cycle(requests)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        conn = Connection(url.hostname, url.port or 80)
+        while time.perf_counter() < deadline:
+            method, path, body, headers = next(rotation)
+            started = time.perf_counter()
+            try:
+                status, response_headers, data = await conn.request(method, path, body, headers)
+            except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                await conn.close()
+                continue
+            latencies.append(time.perf_counter() - started)
+            if status >= 500:
+                errors += 1
+            if on_response is not None:
+                on_response(method, path, status, response_headers, data)
+        await conn.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+def normalize_requests(requests):
+    """Acepta rutas sueltas ("/planets") o tuplas (método, ruta, body, headers)"""
+    normalized = []
+    for item in requests:
+        if isinstance(item, str):
+            item = ("GET", item)
+        method, path, body, headers = (tuple(item) + (b"", None))[:4]
+        normalized.append((method, path, body or b"", headers or {}))
+    return normalized
+
+
+def run_load(base_url, requests, concurrency=10, duration=10.0, on_response=None):
+    latencies, errors, elapsed = asyncio.run(
+        _load(base_url, normalize_requests(requests), concurrency, duration, on_response)
+    )
+    return summarize(latencies, errors, elapsed)
+
+
+async def wait_until_up(base_url, path="/planets?limit=1", timeout=30.0):
+    url = urlsplit(base_url)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        conn = Connection(url.hostname, url.port or 80)
+        try:
+            status, _, _ = await conn.request("GET", path)
+            await conn.close()
+            if status < 500:
+                return True
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        await asyncio.sleep(0.2)
+    return False
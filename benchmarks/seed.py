@@ -0,0 +1,92 @@
+"""
+Datos sintéticos para los benchmarks, insertados por lotes con executemany.
+
+Los favoritos solo apuntan a entidades fuera del rango `scratch_ids`: esas
+quedan libres para los escenarios que editan, marcan como favorito o borran.
+"""
+import time
+from sqlalchemy import insert, func, select
+from leaderboard import rebuild_counts
+from models import (db, User, Planets, Species, People, ImgPlanets, ImgPeople, ImgSpecies,
+                    user_planet_favorites, user_species_favorites, user_people_favorites)
+
+BATCH = 50000
+
+FAVORITE_TABLES = [
+    (user_planet_favorites, "planet_id"),
+    (user_species_favorites, "species_id"),
+    (user_people_favorites, "person_id"),
+]
+
+
+def planet_row(i):
+    return {"name": f"Planet {i}", "description": "bench", "population": (i * 7919) % 1000000,
+            "climate": ("arid", "temperate", "frozen", "murky")[i % 4], "gravity": 1, "diameter": i,
+            "orbital_period": 1, "terrain": ("desert", "forest", "ocean")[i % 3], "rotation_period": 1}
+
+
+def person_row(i):
+    return {"name": f"Person {i}", "description": "bench", "height": 150 + i % 60,
+            "gender": ("male", "female", "n/a")[i % 3], "birth_year": "19BBY", "hair_color": "brown",
+            "mass": 70, "skin_color": "fair"}
+
+
+def species_row(i):
+    return {"name": f"Species {i}", "description": "bench", "classification": ("mammal", "reptile")[i % 2],
+            "language": "basic", "average_lifespan": 80, "average_height": 170, "designation": "sentient",
+            "eye_colors": "blue", "hair_colors": "brown"}
+
+
+def user_row(i):
+    return {"email": f"bench{i}@example.com", "password": "x", "description": "bench", "age": 18 + i % 60,
+            "nickname": f"bench{i}", "is_active": True}
+
+
+def image_row(kind, i):
+    return {"id": i + 1, "url": f"https://img.example.com/{kind}/{i + 1}.jpg"}
+
+
+def scratch_ids(entities):
+    """Ids reservados (sin favoritos sembrados) para los escenarios de escritura"""
+    size = max(1, min(5000, entities // 10))
+    return list(range(entities - size + 1, entities + 1))
+
+
+def insert_batches(table, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH:
+            db.session.execute(insert(table), batch)
+            batch = []
+    if batch:
+        db.session.execute(insert(table), batch)
+
+
+def favorite_rows(users, entities, favorites, column):
+    """Pares (user, entidad) únicos repartidos entre todos los usuarios"""
+    eligible = entities - len(scratch_ids(entities))
+    count = min(favorites, users * eligible)
+    for i in range(count):
+        user, turn = i % users, i // users
+        yield {"user_id": user + 1, column: (turn + user * 31) % eligible + 1}
+
+
+def seed(users, entities, favorites):
+    """Llena una base vacía; devuelve los segundos que tardó (0 si ya estaba sembrada)"""
+    db.create_all()
+    if db.session.execute(select(func.count()).select_from(User)).scalar():
+        return 0.0
+    started = time.perf_counter()
+    insert_batches(User, (user_row(i) for i in range(users)))
+    insert_batches(Planets, (planet_row(i) for i in range(entities)))
+    insert_batches(People, (person_row(i) for i in range(entities)))
+    insert_batches(Species, (species_row(i) for i in range(entities)))
+    for kind, model in (("planets", ImgPlanets), ("people", ImgPeople), ("species", ImgSpecies)):
+        insert_batches(model, (image_row(kind, i) for i in range(entities)))
+    for index, (table, column) in enumerate(FAVORITE_TABLES):
+        share = favorites // 3 + (1 if index < favorites % 3 else 0)
+        insert_batches(table, favorite_rows(users, entities, share, column))
+    rebuild_counts()
+    db.session.commit()
+    return time.perf_counter() - started
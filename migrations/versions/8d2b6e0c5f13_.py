@@ -0,0 +1,37 @@
+"""add catalog filter indexes
+
+Revision ID: 8d2b6e0c5f13
+Revises: 3c9e1f4a7b21
+Create Date: 2026-10-18 11:40:07.913254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2b6e0c5f13'
+down_revision = '3c9e1f4a7b21'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = {
+    'people': ['name', 'gender', 'height'],
+    'planets': ['name', 'climate', 'terrain', 'population'],
+    'species': ['name', 'classification', 'language'],
+}
+
+
+def upgrade():
+    for table, columns in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.create_index(f'ix_{table}_{column}_id', [column, 'id'], unique=False)
+
+
+def downgrade():
+    for table, columns in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for column in columns:
+                batch_op.drop_index(f'ix_{table}_{column}_id')
@@ -0,0 +1,71 @@
+"""add full text search indexes
+
+Revision ID: b47a0d9e2c68
+Revises: 8d2b6e0c5f13
+Create Date: 2026-10-18 12:55:43.120587
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b47a0d9e2c68'
+down_revision = '8d2b6e0c5f13'
+branch_labels = None
+depends_on = None
+
+
+# código de tipo usado en el rowid de catalog_search (id * 4 + código)
+KINDS = {'people': 1, 'planets': 2, 'species': 3}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in KINDS:
+            op.execute(
+                f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+                f"setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+                f"setweight(to_tsvector('simple', coalesce(description, '')), 'B')) STORED"
+            )
+            op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+    elif dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5("
+            "name, description, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        for table, code in KINDS.items():
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO catalog_search (rowid, name, description) VALUES (new.id * 4 + {code}, new.name, new.description); "
+                f"END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF id, name, description ON {table} BEGIN "
+                f"DELETE FROM catalog_search WHERE rowid = old.id * 4 + {code}; "
+                f"INSERT INTO catalog_search (rowid, name, description) VALUES (new.id * 4 + {code}, new.name, new.description); "
+                f"END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM catalog_search WHERE rowid = old.id * 4 + {code}; "
+                f"END"
+            )
+            op.execute(
+                f"INSERT INTO catalog_search (rowid, name, description) "
+                f"SELECT id * 4 + {code}, name, description FROM {table}"
+            )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        for table in KINDS:
+            op.drop_index(f'ix_{table}_search_vector', table_name=table)
+            op.drop_column(table, 'search_vector')
+    elif dialect == 'sqlite':
+        for table in KINDS:
+            for action in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER IF EXISTS {table}_search_{action}")
+        op.execute("DROP TABLE IF EXISTS catalog_search")
@@ -0,0 +1,54 @@
+"""add reverse favorite indexes and favorite_count
+
+Revision ID: c81f5d2a9e47
+Revises: b47a0d9e2c68
+Create Date: 2026-10-18 16:20:44.108326
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81f5d2a9e47'
+down_revision = 'b47a0d9e2c68'
+branch_labels = None
+depends_on = None
+
+
+FAVORITE_TABLES = {
+    'user_planet_favorites': ('planet_id', 'planets'),
+    'user_species_favorites': ('species_id', 'species'),
+    'user_people_favorites': ('person_id', 'people'),
+}
+
+
+def upgrade():
+    for table, (column, _) in FAVORITE_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.create_index(f'ix_{table}_{column}', [column, 'user_id'], unique=False)
+
+    op.create_table('favorite_count',
+    sa.Column('kind', sa.String(), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('fans', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'entity_id')
+    )
+    with op.batch_alter_table('favorite_count', schema=None) as batch_op:
+        batch_op.create_index('ix_favorite_count_kind_fans', ['kind', 'fans', 'entity_id'], unique=False)
+
+    for table, (column, kind) in FAVORITE_TABLES.items():
+        op.execute(
+            f"INSERT INTO favorite_count (kind, entity_id, fans) "
+            f"SELECT '{kind}', {column}, count(*) FROM {table} GROUP BY {column}"
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('favorite_count', schema=None) as batch_op:
+        batch_op.drop_index('ix_favorite_count_kind_fans')
+    op.drop_table('favorite_count')
+
+    for table, (column, _) in FAVORITE_TABLES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_index(f'ix_{table}_{column}')
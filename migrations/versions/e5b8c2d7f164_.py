@@ -0,0 +1,34 @@
+"""add version column to people, planets and species
+
+Revision ID: e5b8c2d7f164
+Revises: d4e7a1c0b952
+Create Date: 2026-10-18 17:48:30.915204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8c2d7f164'
+down_revision = 'd4e7a1c0b952'
+branch_labels = None
+depends_on = None
+
+
+TABLES = ('people', 'planets', 'species')
+
+
+def upgrade():
+    for table in TABLES:
+        op.add_column(table, sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    for table in TABLES:
+        if op.get_bind().dialect.name == 'sqlite':
+            # DROP COLUMN nativo (SQLite >= 3.35): el modo batch recrearía la
+            # tabla y se perderían los triggers de la búsqueda
+            op.execute(f'ALTER TABLE {table} DROP COLUMN version')
+        else:
+            op.drop_column(table, 'version')
@@ -0,0 +1,57 @@
+"""add ON DELETE CASCADE to the favorite tables
+
+Revision ID: f2a6d9b3c418
+Revises: e5b8c2d7f164
+Create Date: 2026-10-18 18:32:07.640158
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a6d9b3c418'
+down_revision = 'e5b8c2d7f164'
+branch_labels = None
+depends_on = None
+
+
+FAVORITE_TABLES = {
+    'user_planet_favorites': ('planet_id', 'planets'),
+    'user_species_favorites': ('species_id', 'species'),
+    'user_people_favorites': ('person_id', 'people'),
+}
+
+
+def favorite_table(table, column, referent, ondelete):
+    """Definición completa de la tabla, para recrearla en SQLite (modo batch)"""
+    return sa.Table(
+        table, sa.MetaData(),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('user.id', ondelete=ondelete), primary_key=True),
+        sa.Column(column, sa.Integer(), sa.ForeignKey(f'{referent}.id', ondelete=ondelete), primary_key=True),
+        sa.Index(f'ix_{table}_{column}', column, 'user_id'),
+    )
+
+
+def set_ondelete(ondelete):
+    bind = op.get_bind()
+    for table, (column, referent) in FAVORITE_TABLES.items():
+        if bind.dialect.name == 'sqlite':
+            # SQLite no puede cambiar una FOREIGN KEY: se copia la tabla a una nueva
+            with op.batch_alter_table(table, recreate='always',
+                                      copy_from=favorite_table(table, column, referent, ondelete)):
+                pass
+            continue
+        # PostgreSQL / MySQL: las FK se crearon sin nombre, se buscan los que les puso la base
+        for fk in sa.inspect(bind).get_foreign_keys(table):
+            op.drop_constraint(fk['name'], table, type_='foreignkey')
+            op.create_foreign_key(fk['name'], table, fk['referred_table'], fk['constrained_columns'],
+                                  fk['referred_columns'], ondelete=ondelete)
+
+
+def upgrade():
+    set_ondelete('CASCADE')
+
+
+def downgrade():
+    set_ondelete(None)
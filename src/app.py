@@ -6,12 +6,28 @@ from flask import Flask, request, jsonify, url_for
 from flask_migrate import Migrate
 from flask_swagger import swagger
 from flask_cors import CORS
-from utils import APIException, generate_sitemap
+from utils import APIException, generate_sitemap, wants_stream, ndjson_response, json_response
 from admin import setup_admin
 from models import db, User, Planets, Species, People
+from catalog import list_page, get_entity, list_users, user_favorites, stream_all, stream_users
+from favorites import apply_bulk, set_favorite
+from idempotency import setup_idempotency, idempotent
+from patch import patch_entity, wants_minimal
+from bulk import bulk_load, bulk_delete
+from cache import setup_cache, cached_json, catalog_cache
+from versions import conditional
+from metrics import setup_metrics, render_metrics
+from serializers import setup_json
+from search import search
+from autocomplete import setup_autocomplete, autocomplete
+from pool import engine_options, pool_status
+from replicas import setup_replicas
+from leaderboard import top_favorites
+from images import image_urls, cache_control
 
 app = Flask(__name__)
 app.url_map.strict_slashes = False
+setup_json(app)
 
 db_url = os.getenv("DATABASE_URL")
 if db_url is not None:
@@ -19,11 +35,18 @@ if db_url is not None:
 else:
     app.config['SQLALCHEMY_DATABASE_URI'] = "sqlite:////tmp/test.db"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+setup_replicas(app)
 
 MIGRATE = Migrate(app, db)
 db.init_app(app)
 CORS(app)
 setup_admin(app)
+setup_metrics(app)
+setup_cache(app)
+setup_autocomplete(app)
+setup_idempotency(app)
 
 # Handle/serialize errors like a JSON object
 @app.errorhandler(APIException)
@@ -36,88 +59,158 @@ def sitemap():
     return generate_sitemap(app)
 
 
+@app.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    return jsonify(catalog_cache().stats()), 200
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return render_metrics(db.engines), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
+@app.route('/db/pool', methods=['GET'])
+def get_pool_status():
+    engines = {bind or "default": pool_status(engine) for bind, engine in db.engines.items()}
+    return jsonify(engines), 200
+
+
+@app.route('/search', methods=['GET'])
+@conditional("people", "planets", "species")
+def search_catalog():
+    return jsonify(search(request.args)), 200
+
+
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete_names():
+    return jsonify(autocomplete(request.args)), 200
+
+
+@app.route('/images/<kind>', methods=['GET'])
+@conditional("images")
+def get_images(kind):
+    body = image_urls(kind, request.args)
+    return jsonify(body), 200, {"Cache-Control": cache_control(body, request.args)}
+
+
 ################   ENDPOINTS PARA USUARIOS ##################
 
 @app.route('/users', methods=['GET'])
+@conditional("users", "planets", "species", "people")
 def get_all_user():
-    users = User.query.all()
-    status_code = 400 if users is None else 200
-    return jsonify([user.serialize() for user in users]), status_code
+    if wants_stream(request):
+        return ndjson_response(stream_users(request.args))
+    return jsonify(list_users(request.args)), 200
 
 @app.route('/users/favorites/<int:id>', methods=['GET'])
+@conditional("users", "planets", "species", "people")
 def get_all_favorites_user(id):
-    user = User.query.get(id)
-    if user is None:
-        return jsonify({"msg": "usuario no existe"})
-    favorites = {
-        "planets": [planet.serialize_favorites() for planet in user.favorite_planets],
-        "species": [specie.serialize_favorites() for specie in user.favorite_species],
-        "people": [person.serialize_favorites() for person in user.favorite_people]
-    }
-
-    print(favorites)
+    if db.session.get(User, id) is None:
+        return jsonify({"msg": "usuario no existe"}), 404
+    favorites = user_favorites([id])[id]
     return jsonify(favorites), 200
 
 
+################   ENDPOINTS PARA FAVORITOS ##################
+
+def favorite_response(kind, entity_id, messages, remove=False):
+    """Respuesta de los endpoints de un favorito; `changed` dice si el estado cambió"""
+    data = request.get_json()
+    if not data or "user_id" not in data:
+        return jsonify({"msg": messages["missing_user"]})
+    try:
+        user_id = int(data["user_id"])
+    except (TypeError, ValueError):
+        return jsonify({"msg": "usuario no existe"}), 404
+
+    status = set_favorite(kind, user_id, entity_id, remove=remove)
+    if status == "user_not_found":
+        return jsonify({"msg": "usuario no existe"}), 404
+    if status == "not_found":
+        return jsonify({"msg": messages["not_found"]}), 404
+    return jsonify({"msg": messages[status], "changed": status in ("added", "removed")}), 200
+
+@app.route('/favorites/top', methods=['GET'])
+@conditional("planets", "species", "people")
+def get_top_favorites():
+    return jsonify(top_favorites(request.args)), 200
+
+@app.route('/favorites/bulk', methods=['POST'])
+@idempotent
+def add_favorites_bulk():
+    try:
+        results = apply_bulk(request.get_json(silent=True))
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error al agregar favoritos", "error": str(e)}), 500
+    return jsonify({"results": results}), 200
+
+@app.route('/favorites/bulk', methods=['DELETE'])
+@idempotent
+def delete_favorites_bulk():
+    try:
+        results = apply_bulk(request.get_json(silent=True), remove=True)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error al eliminar favoritos", "error": str(e)}), 500
+    return jsonify({"results": results}), 200
+
+
+def patch_response(model, entity_id, key, messages):
+    """Respuesta de los PATCH: la fila actualizada, o 204 sin cuerpo con `Prefer: return=minimal`"""
+    try:
+        row = patch_entity(model, entity_id, request.get_json(silent=True))
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": messages["error"], "error": str(e)}), 500
+    if row is None:
+        return jsonify({"msg": messages["not_found"]}), 404
+    headers = {"X-Entity-Version": str(row["version"])}
+    if wants_minimal(request):
+        headers["Preference-Applied"] = "return=minimal"
+        return "", 204, headers
+    return jsonify({"msg": messages["updated"], key: row}), 200, headers
+
+
 ################   ENDPOINTS PARA PLANETAS ##################
 
 @app.route('/planets/<int:id>', methods=['GET'])
+@conditional("planets", "users")
 def get_planet_by_id(id):
-    planet = Planets.query.get(id)
-    status_code = 400 if planet is None else 200
-    return jsonify(planet.serialize()), status_code
+    body = cached_json("planets", id, request.args, lambda: get_entity(Planets, id, request.args))
+    if body is None:
+        return jsonify({"msg": "planeta no existe"}), 404
+    return json_response(body)
 
 @app.route('/planets', methods=['GET'])
+@conditional("planets", "users")
 def get_all_planets():
-    planets = Planets.query.all()
-    status_code = 400 if planets is None else 200
-    return jsonify([planet.serialize() for planet in planets]), status_code
+    if wants_stream(request):
+        return ndjson_response(stream_all(Planets, request.args))
+    return json_response(cached_json("planets", None, request.args, lambda: list_page(Planets, request.args)))
 
 @app.route('/favorite/planet/<int:planet_id>', methods=['POST'])
+@idempotent
 def add_favorite_planet(planet_id):
-    data = request.get_json()
-    if not data or "user_id" not in data:
-        return jsonify({"msg": "no hay usuario a quien agregar"})
-    
-    planet = Planets.query.get(planet_id)
-
-    if planet is None:
-        return jsonify({"msg": "planeta no existe"}), 404
-    
-    user_id = data["user_id"]
-    user = User.query.get(user_id)   
-
-    if user is None:
-        return jsonify({"msg": "usuario no existe"}), 404
-    else:
-        user.favorite_planets.append(planet)
-        db.session.commit()
-        return jsonify({"msg": "agregado"}), 200 
+    return favorite_response("planets", planet_id, {
+        "missing_user": "no hay usuario a quien agregar",
+        "not_found": "planeta no existe",
+        "added": "agregado",
+        "exists": "el planeta ya es favorito del usuario",
+    })
 
 @app.route('/favorite/planet/<int:planet_id>', methods=['DELETE'])
+@idempotent
 def delete_favorite_planet(planet_id):
-    data = request.get_json()
-    if not data or "user_id" not in data:
-        return jsonify({"msg": "no hay usuario a quien agregar"})
-    
-    planet = Planets.query.get(planet_id)
-
-    if planet is None:
-        return jsonify({"msg": "planeta no existe"}), 404
-    
-    user_id = data["user_id"]
-    user = User.query.get(user_id)   
-
-    if user is None:
-        return jsonify({"msg": "usuario no existe"}), 404
-    
-    if planet in user.favorite_planets:
-        user.favorite_planets.remove(planet)
-        db.session.commit()
-        return jsonify({"msg": "planeta eliminado"})
-    else:
-        return jsonify({"msg": "el planeta no es favorito del usuario"})
-
+    return favorite_response("planets", planet_id, {
+        "missing_user": "no hay usuario a quien agregar",
+        "not_found": "planeta no existe",
+        "removed": "planeta eliminado",
+        "not_favorite": "el planeta no es favorito del usuario",
+    }, remove=True)
 
 @app.route('/planet', methods=['POST'])
 def add_planet():
@@ -157,6 +250,26 @@ def add_planet():
         db.session.rollback()
         return jsonify({"msg": "Error al crear el planeta", "error": str(e)}), 500
     
+@app.route('/planets/bulk', methods=['POST'])
+def add_planets_bulk():
+    try:
+        report = bulk_load(Planets, request)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error en la carga masiva de planetas", "error": str(e)}), 500
+    return jsonify({"msg": "Carga masiva de planetas completada", **report}), 201
+
+@app.route('/planets', methods=['DELETE'])
+def delete_planets_bulk():
+    try:
+        report = bulk_delete(Planets, request.args)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error en el borrado masivo de planetas", "error": str(e)}), 500
+    return jsonify({"msg": "Borrado masivo de planetas completado", **report}), 200
+
 @app.route('/planet/<int:planet_id>', methods=['DELETE'])
 def delete_planet(planet_id):
 
@@ -207,64 +320,52 @@ def update_planet(planet_id):
         db.session.rollback()
         return jsonify({"msg: ": "Error al actualizar el planeta", "error": str(e)}),500
 
+
+@app.route('/planet/<int:planet_id>', methods=['PATCH'])
+def patch_planet(planet_id):
+    return patch_response(Planets, planet_id, "planet", {
+        "updated": "Planeta actualizado exitosamente",
+        "not_found": "Planeta no encontrado",
+        "error": "Error al actualizar el planeta",
+    })
+
+
 ################   ENDPOINTS PARA ESPECIES ##################
 
 @app.route('/species/<int:id>', methods=['GET'])
+@conditional("species", "users")
 def get_species_by_id(id):
-    species = Species.query.get(id)
-    status_code = 400 if species is None else 200
-    return jsonify(species.serialize()), status_code
+    body = cached_json("species", id, request.args, lambda: get_entity(Species, id, request.args))
+    if body is None:
+        return jsonify({"msg": "especie no existe"}), 404
+    return json_response(body)
 
 @app.route('/species', methods=['GET'])
+@conditional("species", "users")
 def get_all_species():
-    species = Species.query.all()
-    status_code = 400 if species is None else 200
-    return jsonify([specie.serialize() for specie in species]), status_code
+    if wants_stream(request):
+        return ndjson_response(stream_all(Species, request.args))
+    return json_response(cached_json("species", None, request.args, lambda: list_page(Species, request.args)))
 
 @app.route('/favorite/species/<int:species_id>', methods=['POST'])
+@idempotent
 def add_favorite_species(species_id):
-    data = request.get_json()
-    if not data or "user_id" not in data:
-        return jsonify({"msg": "es necesario proporcionar un user_id"})
-    
-    species = Species.query.get(species_id)
-
-    if species is None:
-        return jsonify({"msg": "especie no existe"}), 404
-    
-    user_id = data["user_id"]
-    user = User.query.get(user_id)  
-
-    if user is None:
-        return jsonify({"msg": "usuario no existe"}), 404
-    else:
-        user.favorite_species.append(species)
-        db.session.commit()
-        return jsonify({"msg": "agregado"}), 200 
+    return favorite_response("species", species_id, {
+        "missing_user": "es necesario proporcionar un user_id",
+        "not_found": "especie no existe",
+        "added": "agregado",
+        "exists": "la especie ya es favorito del usuario",
+    })
 
 @app.route('/favorite/species/<int:species_id>', methods=['DELETE'])
+@idempotent
 def delete_favorite_species(species_id):
-    data = request.get_json()
-    if not data or "user_id" not in data:
-        return jsonify({"msg": "no hay usuario a quien agregar"})
-    
-    species = Species.query.get(species_id)
-
-    if species is None:
-        return jsonify({"msg": "species no existe"}), 404
-    
-    user_id = data["user_id"]
-    user = User.query.get(user_id)   
-
-    if user is None:
-        return jsonify({"msg": "usuario no existe"}), 404
-    
-    if species in user.favorite_species:
-        user.favorite_species.remove(species)
-        db.session.commit()
-        return jsonify({"msg": "species eliminado"})
-    else:
-        return jsonify({"msg": "la especie no es favorito del usuario"})
+    return favorite_response("species", species_id, {
+        "missing_user": "no hay usuario a quien agregar",
+        "not_found": "species no existe",
+        "removed": "species eliminado",
+        "not_favorite": "la especie no es favorito del usuario",
+    }, remove=True)
 
 @app.route('/species', methods=['POST'])
 def add_species():
@@ -308,6 +409,26 @@ def add_species():
             "error": str(e)
         }), 500
 
+@app.route('/species/bulk', methods=['POST'])
+def add_species_bulk():
+    try:
+        report = bulk_load(Species, request)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error en la carga masiva de especies", "error": str(e)}), 500
+    return jsonify({"msg": "Carga masiva de especies completada", **report}), 201
+
+@app.route('/species', methods=['DELETE'])
+def delete_species_bulk():
+    try:
+        report = bulk_delete(Species, request.args)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error en el borrado masivo de especies", "error": str(e)}), 500
+    return jsonify({"msg": "Borrado masivo de especies completado", **report}), 200
+
 @app.route('/species/<int:species_id>', methods=['DELETE'])
 def delete_species(species_id):
 
@@ -358,65 +479,51 @@ def update_species(species_id):
         return jsonify({"msg: ": "Error al actualizar species", "error": str(e)}),500
 
 
+@app.route('/species/<int:species_id>', methods=['PATCH'])
+def patch_species(species_id):
+    return patch_response(Species, species_id, "species", {
+        "updated": "Species actualizado exitosamente",
+        "not_found": "Species no encontrado",
+        "error": "Error al actualizar species",
+    })
+
+
 ################   ENDPOINTS PARA PERSONAS ##################
 
 @app.route('/people/<int:id>', methods=['GET'])
+@conditional("people", "users")
 def get_people_by_id(id):
-    person = People.query.get(id)
-    status_code = 400 if person is None else 200
-    return jsonify(person.serialize()), status_code
+    body = cached_json("people", id, request.args, lambda: get_entity(People, id, request.args))
+    if body is None:
+        return jsonify({"msg": "persona no existe"}), 404
+    return json_response(body)
 
 @app.route('/people', methods=['GET'])
+@conditional("people", "users")
 def get_all_people():
-    people = People.query.all()
-    status_code = 400 if people is None else 200
-    return jsonify([person.serialize() for person in people]), status_code
+    if wants_stream(request):
+        return ndjson_response(stream_all(People, request.args))
+    return json_response(cached_json("people", None, request.args, lambda: list_page(People, request.args)))
 
 @app.route('/favorite/people/<int:people_id>', methods=['POST'])
+@idempotent
 def add_favorite_people(people_id):
-    data = request.get_json()
-    if not data or "user_id" not in data:
-        return jsonify({"msg": "es necesario proporcionar un user_id"})
-    
-    people = People.query.get(people_id)
-
-    if people is None:
-        return jsonify({"msg": "especie no existe"}), 404
-    
-    user_id = data["user_id"]
-    user = User.query.get(user_id)   
-
-    if user is None:
-        return jsonify({"msg": "usuario no existe"}), 404
-    else:
-        user.favorite_people.append(people)
-        db.session.commit()
-        return jsonify({"msg": "agregado"}), 200 
+    return favorite_response("people", people_id, {
+        "missing_user": "es necesario proporcionar un user_id",
+        "not_found": "persona no existe",
+        "added": "agregado",
+        "exists": "person ya es favorito del usuario",
+    })
 
 @app.route('/favorite/people/<int:person_id>', methods=['DELETE'])
+@idempotent
 def delete_favorite_people(person_id):
-    data = request.get_json()
-    if not data or "user_id" not in data:
-        return jsonify({"msg": "no hay usuario a quien agregar"})
-    
-    person = People.query.get(person_id)
-
-    if person is None:
-        return jsonify({"msg": "person no existe"}), 404
-    
-    user_id = data["user_id"]
-    user = User.query.get(user_id)   
-
-    if user is None:
-        return jsonify({"msg": "usuario no existe"}), 404
-    
-    if person in user.favorite_people:
-        user.favorite_people.remove(person)
-        db.session.commit()
-        return jsonify({"msg": "person eliminado"})
-    else:
-        return jsonify({"msg": "person no es favorito del usuario"})
-    
+    return favorite_response("people", person_id, {
+        "missing_user": "no hay usuario a quien agregar",
+        "not_found": "person no existe",
+        "removed": "person eliminado",
+        "not_favorite": "person no es favorito del usuario",
+    }, remove=True)
 
 @app.route('/people', methods=['POST'])
 def add_person():
@@ -458,6 +565,26 @@ def add_person():
             "error": str(e)
         }), 500
     
+@app.route('/people/bulk', methods=['POST'])
+def add_people_bulk():
+    try:
+        report = bulk_load(People, request)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error en la carga masiva de personajes", "error": str(e)}), 500
+    return jsonify({"msg": "Carga masiva de personajes completada", **report}), 201
+
+@app.route('/people', methods=['DELETE'])
+def delete_people_bulk():
+    try:
+        report = bulk_delete(People, request.args)
+    except APIException:
+        raise
+    except Exception as e:
+        return jsonify({"msg": "Error en el borrado masivo de personajes", "error": str(e)}), 500
+    return jsonify({"msg": "Borrado masivo de personajes completado", **report}), 200
+
 @app.route('/people/<int:people_id>', methods=['DELETE'])
 def delete_people(people_id):
 
@@ -506,6 +633,15 @@ def update_people(person_id):
         return jsonify({"msg: ": "Error al actualizar person", "error": str(e)}),500
 
 
+@app.route('/people/<int:person_id>', methods=['PATCH'])
+def patch_people(person_id):
+    return patch_response(People, person_id, "person", {
+        "updated": "Persona actualizada exitosamente",
+        "not_found": "Persona no encontrada",
+        "error": "Error al actualizar person",
+    })
+
+
 # this only runs if `$ python src/app.py` is executed
 if __name__ == '__main__':
     PORT = int(os.environ.get('PORT', 3000))
@@ -0,0 +1,168 @@
+"""
+Punto de entrada ASGI, junto a wsgi.py:
+
+    uvicorn asgi:app --app-dir src
+
+Los GET de lectura (listas y detalle de planets/species/people, /users y
+/users/favorites/<id>) se atienden con handlers async sobre el engine async de
+SQLAlchemy (asyncpg o aiosqlite), así un proceso mantiene cientos de requests
+en vuelo mientras esperan a la base. Reutilizan las mismas consultas de
+catalog.py con `AsyncConnection.run_sync`: el código síncrono corre en un
+greenlet y cada consulta cede el event loop mientras espera la respuesta.
+Devuelven lo mismo que la app Flask, con ETag/Last-Modified, 304 y caché.
+
+El resto de rutas (escrituras, NDJSON, admin, búsqueda...) pasan a la app
+Flask en un threadpool. Con una base sin driver async todo va a Flask.
+"""
+import os
+import re
+from urllib.parse import parse_qsl
+from asgiref.wsgi import WsgiToAsgi
+from flask import g
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+from app import app as flask_app
+from models import User, Planets, Species, People
+from catalog import list_page, get_entity, list_users, user_favorites, read
+from cache import cached_json
+from versions import validators, header_date, is_not_modified
+from replicas import using_connection
+from utils import APIException
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+CATALOG = {
+    "planets": (Planets, "planeta no existe"),
+    "species": (Species, "especie no existe"),
+    "people": (People, "persona no existe"),
+}
+
+USER_KINDS = ("users", "planets", "species", "people")
+
+
+def async_url(database_url):
+    url = make_url(database_url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    return url.set(drivername=driver) if driver else None
+
+
+def catalog_list(args, kind):
+    model = CATALOG[kind][0]
+    return 200, cached_json(kind, None, args, lambda: list_page(model, args))
+
+
+def catalog_detail(args, kind, entity_id):
+    model, missing = CATALOG[kind]
+    body = cached_json(kind, int(entity_id), args, lambda: get_entity(model, int(entity_id), args))
+    if body is None:
+        return 404, flask_app.json.dumps({"msg": missing})
+    return 200, body
+
+
+def users_list(args):
+    return 200, flask_app.json.dumps(list_users(args))
+
+
+def users_favorites(args, user_id):
+    user_id = int(user_id)
+    if read(select(User.__table__.c.id).where(User.__table__.c.id == user_id)).first() is None:
+        return 404, flask_app.json.dumps({"msg": "usuario no existe"})
+    return 200, flask_app.json.dumps(user_favorites([user_id])[user_id])
+
+
+# (patrón, handler, tipos de los que depende la respuesta)
+ROUTES = [
+    (re.compile(r"/(planets|species|people)/?"), catalog_list, lambda kind: (kind, "users")),
+    (re.compile(r"/(planets|species|people)/(\d+)/?"), catalog_detail, lambda kind, _: (kind, "users")),
+    (re.compile(r"/users/?"), users_list, lambda: USER_KINDS),
+    (re.compile(r"/users/favorites/(\d+)/?"), users_favorites, lambda _: USER_KINDS),
+]
+
+
+def match_route(path):
+    for pattern, handler, kinds in ROUTES:
+        match = pattern.fullmatch(path)
+        if match:
+            return handler, kinds(*match.groups()), match.groups()
+    return None
+
+
+class AsyncApp:
+    def __init__(self, wsgi_app, database_url):
+        self.wsgi = WsgiToAsgi(wsgi_app)
+        url = async_url(database_url)
+        self.engine = None
+        if url is not None:
+            options = {}
+            if url.get_backend_name() != "sqlite":
+                options = {
+                    "pool_size": int(os.environ.get("DB_POOL_SIZE", 5)),
+                    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+                    "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", 30)),
+                    "pool_recycle": int(os.environ.get("DB_POOL_RECYCLE", 1800)),
+                    "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+                }
+            self.engine = create_async_engine(url, **options)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self.lifespan(receive, send)
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD") and self.engine is not None:
+            route = match_route(scope["path"])
+            headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+            args = MultiDict(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+            streaming = args.get("stream") == "1" or "ndjson" in headers.get("accept", "")
+            if route is not None and not streaming:
+                return await self.handle(scope, send, route, args, headers)
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.engine is not None:
+                    await self.engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    async def handle(self, scope, send, route, args, headers):
+        async with self.engine.connect() as conn:
+            status, body, extra = await conn.run_sync(self.run, route, scope["path"], args, headers)
+        response_headers = [(b"content-type", b"application/json")] if body else []
+        response_headers += [(name.encode(), value.encode()) for name, value in extra]
+        if "origin" in headers:
+            response_headers.append((b"access-control-allow-origin", b"*"))
+        payload = (body + "\n").encode() if body else b""
+        response_headers.append((b"content-length", str(len(payload)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": response_headers})
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else payload})
+
+    def run(self, sync_conn, route, path, args, headers):
+        """Corre dentro del greenlet de run_sync: aquí el código es el mismo que en Flask"""
+        handler, kinds, params = route
+        with flask_app.app_context(), using_connection(sync_conn):
+            try:
+                versions, etag, last_modified = validators(kinds, path, args, headers.get("accept", ""))
+                g.table_versions = versions
+                extra = [("etag", quote_etag(etag))]
+                modified = header_date(last_modified)
+                if modified is not None:
+                    extra.append(("last-modified", http_date(modified)))
+                if_none_match = parse_etags(headers["if-none-match"]) if "if-none-match" in headers else None
+                if is_not_modified(etag, last_modified, if_none_match, parse_date(headers.get("if-modified-since"))):
+                    return 304, "", extra
+                status, body = handler(args, *params)
+            except APIException as error:
+                return error.status_code, flask_app.json.dumps(error.to_dict()), []
+        return status, body, extra if status == 200 else []
+
+
+app = AsyncApp(flask_app, flask_app.config['SQLALCHEMY_DATABASE_URI'])
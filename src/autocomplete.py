@@ -0,0 +1,231 @@
+"""
+Autocompletado por prefijo sobre los nombres de people, planets y species,
+servido desde un índice ordenado en memoria (uno por tipo y por proceso).
+
+Cada nombre entra una vez por cada palabra en la que puede empezar la
+búsqueda ("Luke Skywalker" -> "luke skywalker" y "skywalker"), normalizado
+sin mayúsculas ni tildes. Buscar es un bisect y recorrer las claves que
+empiezan por el prefijo, sin tocar la base de datos.
+
+El índice se construye en el primer uso y se mantiene con la versión
+`names:<tipo>` de `table_version`, que solo cambia con altas, bajas y cambios
+de nombre (no con favoritos ni otras columnas):
+- los commits de este proceso dejan pendientes los ids cuyo nombre tocaron y
+  se releen en la siguiente consulta;
+- como mucho cada `AUTOCOMPLETE_SYNC_INTERVAL` segundos se compara esa
+  versión; si otro worker cambió nombres, ese tipo se recarga en un hilo
+  aparte y mientras tanto se sigue respondiendo con el índice anterior.
+Todo se lee del primario aunque haya réplicas configuradas.
+"""
+import os
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from flask import current_app, has_app_context
+from sqlalchemy import select
+from utils import APIException
+from catalog import FAVORITE_KINDS, read
+from versions import current_versions, names_kind, on_commit
+from replicas import primary
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in text if not unicodedata.combining(char)).casefold()
+
+
+def name_keys(name):
+    words = re.findall(r"\w+", normalize(name))
+    return [" ".join(words[start:]) for start in range(len(words))]
+
+
+class NameIndex:
+    """Lista ordenada de (clave, id) para un tipo, con los nombres por id"""
+
+    def __init__(self, model):
+        self.model = model
+        self.entries = []
+        self.names = {}
+        self.version = None
+        self.pending = set()
+        self.stale = True
+        # mientras se recarga, los commits se anotan y se aplican después del cambio
+        self.rebuilding = None
+        self.notes = []
+        self.lock = threading.RLock()
+
+    def reload(self):
+        """Arma el índice nuevo sin el lock (las consultas siguen con el anterior) y lo cambia de una vez"""
+        kind = names_kind(self.model.__tablename__)
+        version = current_versions([kind])[kind][0]
+        table = self.model.__table__
+        entries, names = [], {}
+        for entity_id, name in read(select(table.c.id, table.c.name)):
+            names[entity_id] = name
+            entries += [(key, entity_id) for key in name_keys(name)]
+        entries.sort()
+        with self.lock:
+            notes, self.notes, self.rebuilding = self.notes, [], None
+            self.entries, self.names = entries, names
+            self.version, self.pending, self.stale = version, set(), False
+            for noted, ids in sorted(notes, key=lambda note: note[0]):
+                self.committed(noted, ids)
+
+    def reload_in_background(self):
+        """Lanza la recarga en otro hilo, salvo que ya haya una en curso"""
+        with self.lock:
+            if self.rebuilding is not None:
+                return
+            app = current_app._get_current_object()
+            self.rebuilding = threading.Thread(target=self._reload_with, args=(app,), daemon=True)
+        self.rebuilding.start()
+
+    def _reload_with(self, app):
+        with app.app_context():
+            try:
+                self.reload()
+            except Exception:
+                with self.lock:
+                    self.rebuilding, self.notes, self.stale = None, [], True
+                raise
+
+    def _remove(self, entity_id):
+        for key in name_keys(self.names.pop(entity_id)):
+            index = bisect_left(self.entries, (key, entity_id))
+            del self.entries[index]
+
+    def _add(self, entity_id, name):
+        self.names[entity_id] = name
+        for key in name_keys(name):
+            insort(self.entries, (key, entity_id))
+
+    def refresh_pending(self):
+        """Relee los ids pendientes: los que ya no están se borraron"""
+        ids, self.pending = self.pending, set()
+        table = self.model.__table__
+        rows = dict(read(select(table.c.id, table.c.name).where(table.c.id.in_(ids))).all())
+        for entity_id in ids:
+            if entity_id in self.names:
+                self._remove(entity_id)
+            if entity_id in rows:
+                self._add(entity_id, rows[entity_id])
+
+    def committed(self, version, ids):
+        if self.rebuilding is not None:
+            self.notes.append((version, ids))
+            return
+        if self.stale or self.version is None or version <= self.version:
+            return
+        if version == self.version + 1:
+            self.version = version
+            if None in ids:
+                # altas sin ids (executemany sin RETURNING): hay que recargar el tipo
+                self.stale = True
+            else:
+                self.pending |= ids
+        else:
+            # nos saltamos una versión (escribió otro worker): mejor recargar
+            self.stale = True
+
+    def lookup(self, prefix, limit):
+        matches = {}
+        index = bisect_left(self.entries, (prefix,))
+        while index < len(self.entries) and len(matches) < limit:
+            key, entity_id = self.entries[index]
+            if not key.startswith(prefix):
+                break
+            matches.setdefault(entity_id, key)
+            index += 1
+        return [(self.names[entity_id], entity_id, key) for entity_id, key in matches.items()]
+
+
+class Autocomplete:
+    def __init__(self, sync_interval=1.0):
+        self.sync_interval = sync_interval
+        self.indexes = {kind: NameIndex(model) for kind, model in FAVORITE_KINDS.items()}
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def sync(self, kinds):
+        # siempre contra el primario: las versiones que anotan los commits son las suyas
+        with primary():
+            self._sync(kinds)
+
+    def _sync(self, kinds):
+        now = time.monotonic()
+        with self.lock:
+            check = now - self.checked_at >= self.sync_interval or any(self.indexes[k].stale for k in kinds)
+            if check:
+                self.checked_at = now
+        versions = current_versions([names_kind(kind) for kind in kinds]) if check else {}
+        for kind in kinds:
+            index = self.indexes[kind]
+            if index.version is None:
+                # primer uso: no hay índice anterior con el que responder
+                with index.lock:
+                    if index.version is None:
+                        index.reload()
+                continue
+            version = versions.get(names_kind(kind), (None,))[0]
+            if version is not None and (index.stale or version > index.version):
+                index.reload_in_background()
+            with index.lock:
+                if index.pending:
+                    index.refresh_pending()
+
+    def committed(self, touched, created, versions):
+        for kind, index in self.indexes.items():
+            name = names_kind(kind)
+            if name not in versions:
+                continue
+            ids = {entity_id for k, entity_id in touched | created if k == name}
+            with index.lock:
+                index.committed(versions[name], ids)
+
+    def lookup(self, prefix, kinds, limit):
+        self.sync(kinds)
+        results = []
+        for kind in kinds:
+            index = self.indexes[kind]
+            with index.lock:
+                results += [(name, entity_id, key, kind) for name, entity_id, key in index.lookup(prefix, limit)]
+        # mismo orden que el índice: por la parte del nombre que coincidió
+        results.sort(key=lambda hit: (hit[2], hit[3], hit[1]))
+        return [{"kind": kind, "id": entity_id, "name": name} for name, entity_id, _, kind in results[:limit]]
+
+
+def parse_args(args):
+    prefix = " ".join(re.findall(r"\w+", normalize(args.get("prefix"))))
+    if not prefix:
+        raise APIException("el parámetro prefix es obligatorio", status_code=400)
+    kinds = [kind.strip() for kind in args.get("kinds", "").split(",") if kind.strip()] or list(FAVORITE_KINDS)
+    unknown = [kind for kind in kinds if kind not in FAVORITE_KINDS]
+    if unknown:
+        raise APIException(f"tipos desconocidos: {', '.join(unknown)}", status_code=400)
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise APIException("limit debe ser un número entero", status_code=400)
+    return prefix, kinds, max(1, min(limit, MAX_LIMIT))
+
+
+def setup_autocomplete(app):
+    app.config.setdefault('AUTOCOMPLETE_SYNC_INTERVAL', float(os.environ.get('AUTOCOMPLETE_SYNC_INTERVAL', 1)))
+    app.extensions['autocomplete'] = Autocomplete(app.config['AUTOCOMPLETE_SYNC_INTERVAL'])
+
+
+@on_commit
+def _update_indexes(touched, created, versions):
+    if has_app_context() and 'autocomplete' in current_app.extensions:
+        current_app.extensions['autocomplete'].committed(touched, created, versions)
+
+
+def autocomplete(args):
+    prefix, kinds, limit = parse_args(args)
+    results = current_app.extensions['autocomplete'].lookup(prefix, kinds, limit)
+    return {"prefix": args.get("prefix"), "results": results}
@@ -0,0 +1,207 @@
+"""
+Carga masiva del catálogo: valida todas las filas y las escribe con INSERT /
+UPDATE por lotes (executemany), haciendo commit cada `chunk_size` filas.
+También el borrado masivo por ids con un solo DELETE
+"""
+import json
+import time
+from sqlalchemy import select, insert, update, delete, func
+from utils import APIException, chunks, parse_ids
+from models import db, People, Planets, Species
+from versions import touch, touch_name
+from leaderboard import forget_counts
+
+REQUIRED_FIELDS = {
+    Planets: [
+        "name", "description", "population", "climate",
+        "gravity", "diameter", "orbital_period",
+        "terrain", "rotation_period"
+    ],
+    Species: [
+        "name", "description", "classification", "language",
+        "average_lifespan", "average_height", "designation",
+        "eye_colors", "hair_colors"
+    ],
+    People: [
+        "name", "description", "height", "gender", "birth_year",
+        "hair_color", "mass", "skin_color"
+    ],
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10000
+MAX_DELETE_IDS = 1000
+
+
+def read_rows(request):
+    """Acepta un array JSON o NDJSON (una fila por línea)"""
+    if request.mimetype == "application/x-ndjson":
+        rows = []
+        for number, line in enumerate(request.get_data(as_text=True).splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                raise APIException(f"línea {number} no es JSON válido", status_code=400)
+        return rows
+
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        raise APIException("se esperaba un array JSON o NDJSON", status_code=400)
+    return rows
+
+
+def parse_chunk_size(raw):
+    if raw is None:
+        return DEFAULT_CHUNK_SIZE
+    try:
+        size = int(raw)
+    except ValueError:
+        raise APIException("chunk_size debe ser un número entero", status_code=400)
+    if size < 1:
+        raise APIException("chunk_size debe ser mayor que 0", status_code=400)
+    return min(size, MAX_CHUNK_SIZE)
+
+
+def valid_value(column, value):
+    """El valor JSON coincide con el tipo de la columna (sin aceptar true/false como números)"""
+    python_type = column.type.python_type
+    if python_type is int and isinstance(value, bool):
+        return False
+    return isinstance(value, python_type)
+
+
+def validate_rows(model, rows):
+    fields = REQUIRED_FIELDS[model]
+    errors = []
+    clean = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({"row": index, "msg": "la fila debe ser un objeto"})
+            continue
+        missing = [field for field in fields if field not in row]
+        if missing:
+            errors.append({"row": index, "msg": f"Faltan campos requeridos: {', '.join(missing)}"})
+            continue
+        wrong = [field for field in fields if not valid_value(model.__table__.c[field], row[field])]
+        if wrong:
+            errors.append({"row": index, "msg": f"Campos con tipo inválido: {', '.join(wrong)}"})
+            continue
+        clean.append({field: row[field] for field in fields})
+    return clean, errors
+
+
+def ids_by_name(model, names):
+    rows = db.session.execute(
+        select(model.name, func.min(model.id)).where(model.name.in_(names)).group_by(model.name)
+    )
+    return dict(rows.all())
+
+
+def bulk_write(model, rows, upsert=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Escribe las filas ya validadas. Con upsert=True las filas cuyo `name` ya
+    existe se actualizan (si hay repetidos en el payload gana el último).
+    Si un bloque falla responde 500 con el reporte de lo ya guardado y el
+    índice (desde 0) del bloque que falló
+    """
+    started = time.perf_counter()
+    if upsert:
+        rows = list({row["name"]: row for row in rows}.values())
+
+    inserted = updated = committed_chunks = 0
+    try:
+        for chunk in chunks(rows, chunk_size):
+            new_rows = chunk
+            changed = []
+            if upsert:
+                existing = ids_by_name(model, [row["name"] for row in chunk])
+                changed = [dict(row, id=existing[row["name"]]) for row in chunk if row["name"] in existing]
+                new_rows = [row for row in chunk if row["name"] not in existing]
+                if changed:
+                    db.session.execute(update(model), changed)
+            if new_rows:
+                if db.session.get_bind().dialect.insert_executemany_returning:
+                    new_ids = db.session.execute(insert(model).returning(model.id), new_rows).scalars().all()
+                else:
+                    # MySQL no devuelve ids en un executemany: se marca el tipo entero
+                    # y el autocompletado lo recarga en vez de leer ids sueltos
+                    db.session.execute(insert(model), new_rows)
+                    new_ids = [None]
+                for new_id in new_ids:
+                    touch(model.__tablename__, new_id, created=True)
+                    touch_name(model.__tablename__, new_id, created=True)
+            for row in changed:
+                touch(model.__tablename__, row["id"])
+            db.session.commit()
+            inserted += len(new_rows)
+            updated += len(changed)
+            committed_chunks += 1
+    except Exception as e:
+        db.session.rollback()
+        # los bloques anteriores ya quedaron guardados: el reporte dice desde dónde reanudar
+        raise APIException("la carga se interrumpió; los bloques anteriores quedaron guardados", status_code=500, payload={
+            "inserted": inserted,
+            "updated": updated,
+            "chunks": committed_chunks,
+            "chunk_size": chunk_size,
+            "rows_committed": inserted + updated,
+            "failed_chunk": committed_chunks,
+            "error": str(e),
+        })
+
+    elapsed = time.perf_counter() - started
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "chunks": committed_chunks,
+        "chunk_size": chunk_size,
+        "elapsed_ms": round(elapsed * 1000, 2),
+        "rows_per_second": round(len(rows) / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+def bulk_load(model, request):
+    rows = read_rows(request)
+    clean, errors = validate_rows(model, rows)
+    if errors:
+        raise APIException("hay filas inválidas", status_code=400, payload={"errors": errors})
+    mode = request.args.get("mode", "insert")
+    if mode not in ("insert", "upsert"):
+        raise APIException("mode debe ser insert o upsert", status_code=400)
+    upsert = mode == "upsert"
+    return bulk_write(model, clean, upsert=upsert, chunk_size=parse_chunk_size(request.args.get("chunk_size")))
+
+
+def bulk_delete(model, args):
+    """
+    Borra las entidades de `ids=` con un único DELETE; sus favoritos se van en
+    la base por ON DELETE CASCADE, sin leerlos. Devuelve los ids borrados y
+    los que no existían
+    """
+    ids = parse_ids(args.get("ids"), MAX_DELETE_IDS)
+    table = model.__table__
+    stmt = delete(table).where(table.c.id.in_(ids))
+    try:
+        if db.session.get_bind().dialect.delete_returning:
+            deleted = set(db.session.execute(stmt.returning(table.c.id)).scalars())
+        else:
+            # MySQL no tiene DELETE ... RETURNING
+            deleted = set(db.session.execute(select(table.c.id).where(table.c.id.in_(ids)).with_for_update()).scalars())
+            db.session.execute(stmt)
+        for entity_id in deleted:
+            touch(model.__tablename__, entity_id)
+            touch_name(model.__tablename__, entity_id)
+        forget_counts(model.__tablename__, deleted)
+        if deleted:
+            # las listas de favoritos de los usuarios también cambiaron
+            touch("users")
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return {
+        "deleted": sorted(deleted),
+        "missing": [entity_id for entity_id in ids if entity_id not in deleted],
+    }
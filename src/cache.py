@@ -0,0 +1,348 @@
+"""
+Caché de lectura para el catálogo: guarda el JSON ya serializado de las
+respuestas GET de people/planets/species con TTL y tamaño máximo.
+
+La invalidación es por versiones: cada clave incluye la versión del tipo
+(listas) o de la entidad (detalle). Las escrituras suben esas versiones y las
+entradas viejas quedan inalcanzables hasta que el LRU/TTL las descarta. Las
+respuestas con los fans completos (email y nickname) dependen además de
+`users:profiles`, que solo cambia cuando se edita un usuario.
+
+Hay dos backends con la misma interfaz (get, set, version, bump, stats):
+- memory: LRU por proceso, el valor por defecto. No ve las escrituras de
+  otros workers: si `table_version` salta una versión que este proceso no
+  escribió, se invalida todo ese tipo.
+- sqlite: un archivo compartido por todos los workers de gunicorn, así una
+  escritura en un worker invalida la caché de todos.
+
+Leyendo de una réplica la clave lleva también las versiones de tabla que vio
+la réplica, que puede ir atrás de las de la caché.
+"""
+import itertools
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, has_app_context
+
+
+class MemoryBackend:
+    """
+    LRU en memoria. Las versiones salen de un contador que nunca se repite y
+    caducan con el mismo TTL que las entradas: una entrada nunca sobrevive a
+    la versión que la hace alcanzable, así que olvidar versiones viejas es seguro.
+    """
+    shared = False
+
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._versions = {}
+        self._counter = itertools.count(1)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def version(self, name):
+        with self._lock:
+            entry = self._versions.get(name)
+            if entry is None:
+                return 0
+            value, expires = entry
+            if expires <= time.monotonic():
+                del self._versions[name]
+                return 0
+            return value
+
+    def bump(self, name):
+        with self._lock:
+            now = time.monotonic()
+            self._versions[name] = (next(self._counter), now + self.ttl)
+            if len(self._versions) > 4 * self.max_entries:
+                self._versions = {k: v for k, v in self._versions.items() if v[1] > now}
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._versions.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class SQLiteBackend:
+    """
+    Caché compartida en un archivo SQLite (modo WAL) para varios procesos en
+    la misma máquina. El contador de versiones vive en el archivo, así que los
+    números tampoco se repiten entre workers. Las entradas que sobran se borran
+    por antigüedad cada `PRUNE_EVERY` escrituras. hits/misses son del proceso.
+    """
+    PRUNE_EVERY = 100
+    shared = True
+
+    def __init__(self, path, max_entries=1024, ttl=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = self.misses = self.evictions = self.expirations = 0
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS ix_entries_expires ON entries (expires);
+            CREATE TABLE IF NOT EXISTS versions (name TEXT PRIMARY KEY, value INTEGER NOT NULL, expires REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS counter (id INTEGER PRIMARY KEY CHECK (id = 1), value INTEGER NOT NULL);
+            INSERT OR IGNORE INTO counter (id, value) VALUES (1, 0);
+        """)
+        conn.close()
+
+    def _connect(self):
+        # una conexión por hilo, y nueva después de un fork (workers de gunicorn)
+        if getattr(self._local, "pid", None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def get(self, key):
+        row = self._connect().execute("SELECT value, expires FROM entries WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            if row[1] <= time.time():
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, value):
+        conn = self._connect()
+        conn.execute("INSERT OR REPLACE INTO entries (key, value, expires) VALUES (?, ?, ?)",
+                     (key, value, time.time() + self.ttl))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("DELETE FROM entries WHERE expires <= ?", (now,))
+        conn.execute("DELETE FROM versions WHERE expires <= ?", (now,))
+        excess = conn.execute("SELECT count(*) FROM entries").fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY expires LIMIT ?)", (excess,))
+            with self._lock:
+                self.evictions += excess
+
+    def version(self, name):
+        row = self._connect().execute(
+            "SELECT value FROM versions WHERE name = ? AND expires > ?", (name, time.time())
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def bump(self, name):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            value = conn.execute("UPDATE counter SET value = value + 1 WHERE id = 1 RETURNING value").fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO versions (name, value, expires) VALUES (?, ?, ?)",
+                         (name, value, time.time() + self.ttl))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self._connect().executescript("DELETE FROM entries; DELETE FROM versions;")
+
+    def stats(self):
+        entries = self._connect().execute("SELECT count(*) FROM entries").fetchone()[0]
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "pid": os.getpid(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# tabla de `table_version` -> versión de la caché que invalida cuando otro
+# worker la cambia (los fans completos dependen de los perfiles de usuario)
+TABLE_NAMES = {"users": "users:profiles"}
+
+
+def wants_fan_profiles(args):
+    """Si la respuesta trae email y nickname de los fans (ver catalog.parse_fans_mode)"""
+    fans = args.get("fans")
+    if fans is not None:
+        return fans == "full"
+    fields = args.get("fields")
+    return not fields or "fans" in [field.strip() for field in fields.split(",")]
+
+
+class CatalogCache:
+    # por encima de esto una escritura invalida todos los detalles del tipo de una vez
+    MAX_ENTITY_BUMPS = 1000
+
+    def __init__(self, backend):
+        self.backend = backend
+        # con un backend por proceso: última versión de cada tabla que este proceso conoce
+        self.known = {}
+        self._lock = threading.Lock()
+
+    def key(self, kind, entity_id, args):
+        params = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+        profiles = wants_fan_profiles(args)
+        tables = [kind, "users"] if profiles else [kind]
+        seen = g.get("table_versions") if has_app_context() else None
+        if seen:
+            seen = {name: seen[name][0] for name in tables if name in seen}
+            if g.get("replica_bind"):
+                # la réplica puede ir atrás de las versiones de la caché: la entrada
+                # queda atada también a las versiones de tabla que vio la réplica
+                params += "|" + ",".join(f"{name}:{version}" for name, version in sorted(seen.items()))
+            elif not self.backend.shared:
+                self.catch_up(seen)
+        if profiles:
+            params += f"|users:{self.backend.version('users:profiles')}"
+        if entity_id is None:
+            return f"{kind}:list:{self.backend.version(kind)}:{params}"
+        epoch = self.backend.version(f"{kind}:epoch")
+        return f"{kind}:{entity_id}:{epoch}.{self.backend.version(f'{kind}:{entity_id}')}:{params}"
+
+    def catch_up(self, seen):
+        """
+        Compara las versiones de tabla del request con las conocidas: si una
+        avanzó sin pasar por `committed` escribió otro worker, y como no se
+        sabe qué tocó se invalida todo el tipo
+        """
+        with self._lock:
+            missed = []
+            for name, version in seen.items():
+                known = self.known.get(name)
+                if known is not None and version > known:
+                    missed.append(name)
+                if known is None or version > known:
+                    self.known[name] = version
+        for name in missed:
+            self.invalidate(TABLE_NAMES.get(name, name), (None,))
+
+    def committed(self, versions):
+        """Versiones que dejó un commit de este proceso: solo avanza si no falta ninguna"""
+        with self._lock:
+            for name, version in versions.items():
+                if self.known.get(name) == version - 1:
+                    self.known[name] = version
+
+    def get_or_load(self, kind, entity_id, args, loader):
+        key = self.key(kind, entity_id, args)
+        body = self.backend.get(key)
+        if body is None:
+            payload = loader()
+            if payload is None:
+                return None
+            body = current_app.json.dumps(payload)
+            self.backend.set(key, body)
+        return body
+
+    def invalidate(self, kind, entity_ids=()):
+        """Sube la versión de las listas de `kind` y de cada entidad; None en `entity_ids` es todas"""
+        self.backend.bump(kind)
+        if None in entity_ids or len(entity_ids) > self.MAX_ENTITY_BUMPS:
+            self.backend.bump(f"{kind}:epoch")
+            return
+        for entity_id in entity_ids:
+            self.backend.bump(f"{kind}:{entity_id}")
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def make_backend(name, max_entries, ttl, path=None):
+    if name == "memory":
+        return MemoryBackend(max_entries, ttl)
+    if name == "sqlite":
+        return SQLiteBackend(path, max_entries, ttl)
+    raise ValueError(f"CACHE_BACKEND desconocido: {name}")
+
+
+def setup_cache(app):
+    app.config.setdefault('CACHE_BACKEND', os.environ.get('CACHE_BACKEND', 'memory'))
+    app.config.setdefault('CACHE_PATH', os.environ.get('CACHE_PATH', '/tmp/starwars-cache.db'))
+    app.config.setdefault('CACHE_MAX_ENTRIES', int(os.environ.get('CACHE_MAX_ENTRIES', 1024)))
+    app.config.setdefault('CACHE_TTL', float(os.environ.get('CACHE_TTL', 60)))
+    backend = make_backend(
+        app.config['CACHE_BACKEND'], app.config['CACHE_MAX_ENTRIES'],
+        app.config['CACHE_TTL'], app.config['CACHE_PATH']
+    )
+    app.extensions['catalog_cache'] = CatalogCache(backend)
+
+
+def catalog_cache():
+    return current_app.extensions['catalog_cache']
+
+
+def cached_json(kind, entity_id, args, loader):
+    """JSON (texto) de la respuesta, desde la caché o llamando a `loader`; None si no existe"""
+    return catalog_cache().get_or_load(kind, entity_id, args, loader)
+
+
+def invalidate(kind, entity_id=None):
+    catalog_cache().invalidate(kind, () if entity_id is None else (entity_id,))
+
+
+def invalidate_many(kind, entity_ids):
+    catalog_cache().invalidate(kind, entity_ids)
+
+
+def committed(versions):
+    catalog_cache().committed(versions)
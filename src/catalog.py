@@ -0,0 +1,397 @@
+"""
+Consultas de lectura para el catálogo (people, planets, species): paginación
+por cursor (keyset sobre `id` o sobre `sort=`), filtros en SQL, proyección
+de campos con `fields=`, modo de fans con `fans=count|ids|full|none` e imagen
+en línea con `images=1`. También la lista de usuarios con sus favoritos y la
+exportación completa en NDJSON
+"""
+import base64
+import binascii
+import json
+import operator
+import sys
+from sqlalchemy import select, func, literal, union_all, tuple_
+from utils import APIException
+from serializers import row_serializer, dumps
+from replicas import read_connection
+from models import (User, People, Planets, Species, ImgPeople, ImgPlanets, ImgSpecies,
+                    user_people_favorites, user_planet_favorites, user_species_favorites)
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+STREAM_BATCH = 1000
+
+
+def encode_cursor(position):
+    """`position` es el último id, o [valor de orden, id] cuando se usa `sort=`"""
+    raw = json.dumps(position, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, sorted_by=False):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise APIException("cursor inválido", status_code=400)
+    if sorted_by:
+        valid = (
+            isinstance(position, list) and len(position) == 2
+            and type(position[0]) in (int, str) and type(position[1]) is int
+        )
+    else:
+        valid = type(position) is int
+    if not valid:
+        raise APIException("cursor inválido", status_code=400)
+    return position
+
+
+def parse_limit(raw):
+    if raw is None:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise APIException("limit debe ser un número entero", status_code=400)
+    if limit < 1:
+        raise APIException("limit debe ser mayor que 0", status_code=400)
+    return min(limit, MAX_LIMIT)
+
+
+def column_names(model):
+    return [column.key for column in model.__table__.columns]
+
+
+def parse_fields(model, raw):
+    """Devuelve la lista de campos pedidos; `fans` es el único campo que no es columna"""
+    available = column_names(model) + ["fans"]
+    if not raw:
+        return available
+    fields = [field.strip() for field in raw.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise APIException(f"campos desconocidos: {', '.join(unknown)}", status_code=400)
+    if "id" not in fields:
+        fields.insert(0, "id")
+    return fields
+
+
+FILTERABLE = {
+    Planets: ("name", "climate", "terrain", "population"),
+    People: ("name", "gender", "height"),
+    Species: ("name", "classification", "language"),
+}
+
+RANGE_OPERATORS = {
+    "gt": operator.gt,
+    "gte": operator.ge,
+    "lt": operator.lt,
+    "lte": operator.le,
+}
+
+
+def convert_value(column, raw):
+    if column.type.python_type is int:
+        try:
+            return int(raw)
+        except (ValueError, TypeError):
+            raise APIException(f"{column.key} debe ser un número entero", status_code=400)
+    return raw
+
+
+def parse_filters(model, args):
+    """
+    Filtros `campo=v`, `campo__in=a,b`, `campo__gt|gte|lt|lte=v` y
+    `campo__prefix=v`. Los parámetros que no nombran una columna se ignoran.
+    """
+    columns = model.__table__.c
+    conditions = []
+    for key, raw in args.items(multi=True):
+        name, _, op = key.partition("__")
+        if name not in columns:
+            continue
+        if name not in FILTERABLE[model]:
+            raise APIException(f"no se puede filtrar por {name}", status_code=400)
+        column = columns[name]
+        if op in ("", "eq"):
+            conditions.append(column == convert_value(column, raw))
+        elif op == "in":
+            conditions.append(column.in_([convert_value(column, value) for value in raw.split(",")]))
+        elif op in RANGE_OPERATORS:
+            conditions.append(RANGE_OPERATORS[op](column, convert_value(column, raw)))
+        elif op == "prefix" and column.type.python_type is str:
+            # rango [prefijo, siguiente prefijo) para que sirva el índice B-tree;
+            # solo es exacto con collation binaria/C, así que se vuelve a
+            # comprobar con LIKE 'prefijo%' sobre las filas que deja el rango
+            if raw and ord(raw[-1]) < sys.maxunicode:
+                upper = raw[:-1] + chr(ord(raw[-1]) + 1)
+                conditions.extend([column >= raw, column < upper])
+            elif raw:
+                # U+10FFFF no tiene siguiente carácter: basta con la cota inferior
+                conditions.append(column >= raw)
+            if raw:
+                conditions.append(column.startswith(raw, autoescape=True))
+        else:
+            raise APIException(f"operador no soportado: {key}", status_code=400)
+    return conditions
+
+
+def parse_sort(model, raw):
+    """`sort=campo` o `sort=-campo`; devuelve (campo, descendente) o None"""
+    if not raw:
+        return None
+    descending = raw.startswith("-")
+    name = raw.lstrip("-")
+    if name != "id" and name not in FILTERABLE[model]:
+        raise APIException(f"no se puede ordenar por {name}", status_code=400)
+    return None if name == "id" and not descending else (name, descending)
+
+
+def filtered_select(model, args, fields):
+    """
+    SELECT de la página/exportación con filtros, orden y keyset. El orden
+    siempre termina en `id` para que el cursor sea estable.
+    """
+    columns = model.__table__.c
+    sort = parse_sort(model, args.get("sort"))
+    select_fields = list(fields)
+    if sort and sort[0] not in select_fields:
+        select_fields.append(sort[0])
+
+    stmt = select_columns(model, select_fields, wants_images(args)).where(*parse_filters(model, args))
+    after = decode_cursor(args["after"], sorted_by=bool(sort)) if args.get("after") else None
+
+    if sort is None:
+        if after is not None:
+            stmt = stmt.where(columns.id > after)
+        return stmt.order_by(columns.id), None
+
+    column = columns[sort[0]]
+    if after is not None:
+        key = tuple_(column, columns.id)
+        position = tuple_(convert_value(column, after[0]), after[1])
+        stmt = stmt.where(key < position if sort[1] else key > position)
+    if sort[1]:
+        return stmt.order_by(column.desc(), columns.id.desc()), sort
+    return stmt.order_by(column, columns.id), sort
+
+
+def read(stmt):
+    """
+    Ejecuta un SELECT de Core directamente en la conexión de la sesión (o en la
+    réplica del request, ver replicas.py): devuelve filas livianas sin
+    construir objetos del ORM ni pasar por el identity map
+    """
+    return read_connection().execute(stmt)
+
+
+FAN_COLUMNS = {
+    People: user_people_favorites.c.person_id,
+    Planets: user_planet_favorites.c.planet_id,
+    Species: user_species_favorites.c.species_id,
+}
+
+FANS_MODES = ("count", "ids", "full", "none")
+
+FAVORITE_KINDS = {
+    "planets": Planets,
+    "species": Species,
+    "people": People,
+}
+
+IMAGE_MODELS = {
+    People: ImgPeople,
+    Planets: ImgPlanets,
+    Species: ImgSpecies,
+}
+
+USER_FIELDS = ("id", "email", "age", "description", "nickname")
+
+
+def parse_fans_mode(raw, fields):
+    """Sin `fans=` se mantiene el comportamiento anterior: lista completa si se pidió el campo"""
+    if raw is None:
+        return "full" if "fans" in fields else "none"
+    if raw not in FANS_MODES:
+        raise APIException(f"fans debe ser uno de: {', '.join(FANS_MODES)}", status_code=400)
+    return raw
+
+
+def attach_fans(model, results, mode):
+    """Añade los fans a cada resultado con una única consulta sobre la tabla de asociación"""
+    for item in results:
+        item.pop("fans", None)
+    if mode == "none" or not results:
+        return results
+
+    fk = FAN_COLUMNS[model]
+    user_id = fk.table.c.user_id
+    ids = [item["id"] for item in results]
+
+    if mode == "count":
+        counts = dict(read(
+            select(fk, func.count()).where(fk.in_(ids)).group_by(fk)
+        ).all())
+        for item in results:
+            item["fans_count"] = counts.get(item["id"], 0)
+        return results
+
+    fans = {entity_id: [] for entity_id in ids}
+    if mode == "ids":
+        rows = read(select(fk, user_id).where(fk.in_(ids)).order_by(fk, user_id))
+        for entity_id, fan_id in rows:
+            fans[entity_id].append(fan_id)
+    else:
+        users = User.__table__.c
+        rows = read(
+            select(fk, users.id, users.email, users.nickname)
+            .join(User.__table__, users.id == user_id)
+            .where(fk.in_(ids))
+            .order_by(fk, users.id)
+        )
+        for entity_id, fan_id, email, nickname in rows:
+            fans[entity_id].append({"id": fan_id, "email": email, "nickname": nickname})
+    for item in results:
+        item["fans"] = fans[item["id"]]
+    return results
+
+
+def wants_images(args):
+    return args.get("images") == "1"
+
+
+def select_columns(model, fields, images=False):
+    """
+    Columnas pedidas; con `images` se suma `image_url` con un LEFT JOIN a la
+    tabla de imágenes (misma clave que la entidad) en vez de una consulta por fila
+    """
+    table = model.__table__
+    stmt = select(*[table.c[field] for field in fields if field != "fans"])
+    if not images:
+        return stmt
+    image = IMAGE_MODELS[model].__table__
+    return stmt.add_columns(image.c.url.label("image_url")).select_from(
+        table.outerjoin(image, image.c.id == table.c.id)
+    )
+
+
+def get_entity(model, entity_id, args):
+    """Devuelve el dict de una entidad (o None) con los fans según `fans=`"""
+    fields = parse_fields(model, args.get("fields"))
+    stmt = select_columns(model, fields, wants_images(args))
+    result = read(stmt.where(model.__table__.c.id == entity_id))
+    to_dict = row_serializer(tuple(result.keys()))
+    row = result.first()
+    if row is None:
+        return None
+    return attach_fans(model, [to_dict(row)], parse_fans_mode(args.get("fans"), fields))[0]
+
+
+def list_page(model, args):
+    """
+    Devuelve una página del modelo filtrada y ordenada (por `id` si no hay `sort=`):
+    {"results": [...], "next": cursor o None}
+    """
+    limit = parse_limit(args.get("limit"))
+    fields = parse_fields(model, args.get("fields"))
+    fans_mode = parse_fans_mode(args.get("fans"), fields)
+    stmt, sort = filtered_select(model, args, fields)
+
+    result = read(stmt.limit(limit + 1))
+    to_dict = row_serializer(tuple(result.keys()))
+    rows = result.all()
+    results = [to_dict(row) for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = results[-1]
+        next_cursor = encode_cursor([last[sort[0]], last["id"]] if sort else last["id"])
+    if sort and sort[0] not in fields:
+        for item in results:
+            del item[sort[0]]
+    return {"results": attach_fans(model, results, fans_mode), "next": next_cursor}
+
+
+def stream_rows(stmt, decorate):
+    """
+    Recorre `stmt` con un cursor del lado del servidor (yield_per) y emite una
+    línea NDJSON por fila; `decorate` completa cada lote (fans, favoritos)
+    """
+    result = read(stmt.execution_options(yield_per=STREAM_BATCH))
+    to_dict = row_serializer(tuple(result.keys()))
+    for partition in result.partitions():
+        for item in decorate([to_dict(row) for row in partition]):
+            yield dumps(item) + "\n"
+
+
+def stream_all(model, args):
+    """Exporta la tabla (con los mismos filtros, orden y `after`) en NDJSON con memoria constante"""
+    fields = parse_fields(model, args.get("fields"))
+    fans_mode = parse_fans_mode(args.get("fans"), fields)
+    stmt, sort = filtered_select(model, args, fields)
+    extra = sort[0] if sort and sort[0] not in fields else None
+
+    def decorate(rows):
+        if extra:
+            for item in rows:
+                del item[extra]
+        return attach_fans(model, rows, fans_mode)
+    return stream_rows(stmt, decorate)
+
+
+def user_favorites(user_ids):
+    """
+    Favoritos de varios usuarios en una sola consulta (UNION ALL de las tres
+    tablas de asociación unidas a los nombres):
+    {user_id: {"planets": [...], "species": [...], "people": [...]}}
+    """
+    favorites = {user_id: {kind: [] for kind in FAVORITE_KINDS} for user_id in user_ids}
+    if not user_ids:
+        return favorites
+
+    selects = []
+    for kind, model in FAVORITE_KINDS.items():
+        fk = FAN_COLUMNS[model]
+        user_id = fk.table.c.user_id
+        selects.append(
+            select(user_id.label("user_id"), literal(kind).label("kind"), model.__table__.c.id, model.__table__.c.name)
+            .join(model.__table__, model.__table__.c.id == fk)
+            .where(user_id.in_(user_ids))
+        )
+    stmt = union_all(*selects)
+    rows = read(select(stmt.subquery()).order_by("user_id", "kind", "id"))
+    for user_id, kind, entity_id, name in rows:
+        favorites[user_id][kind].append({"name": name, "id": entity_id})
+    return favorites
+
+
+def attach_favorites(users):
+    favorites = user_favorites([user["id"] for user in users])
+    for user in users:
+        for kind, items in favorites[user["id"]].items():
+            user[f"favorite_{kind}"] = items
+    return users
+
+
+def users_select(args):
+    columns = User.__table__.c
+    stmt = select(*[columns[field] for field in USER_FIELDS])
+    if args.get("after"):
+        stmt = stmt.where(columns.id > decode_cursor(args["after"]))
+    return stmt.order_by(columns.id)
+
+
+def stream_users(args):
+    return stream_rows(users_select(args), attach_favorites)
+
+
+def list_users(args):
+    """Página de usuarios con sus favoritos: dos consultas sin importar el tamaño de la página"""
+    limit = parse_limit(args.get("limit"))
+    result = read(users_select(args).limit(limit + 1))
+    to_dict = row_serializer(tuple(result.keys()))
+    rows = result.all()
+    results = attach_favorites([to_dict(row) for row in rows[:limit]])
+
+    next_cursor = encode_cursor(results[-1]["id"]) if len(rows) > limit else None
+    return {"results": results, "next": next_cursor}
@@ -0,0 +1,177 @@
+"""
+Operaciones sobre favoritos directamente en las tablas de asociación, sin
+cargar las colecciones del usuario: un favorito suelto con una sola sentencia
+condicional, y muchos pares (usuario, entidad) con INSERT/DELETE en bloque en
+una sola transacción
+"""
+from collections import Counter
+from sqlalchemy import select, delete, tuple_, literal
+from utils import APIException, insert_ignore, chunks
+from models import db, User
+from catalog import FAN_COLUMNS, FAVORITE_KINDS
+from versions import touch
+from leaderboard import record_fans
+
+BULK_MAX_ITEMS = 10000
+CHUNK_SIZE = 500
+
+
+def set_favorite(kind, user_id, entity_id, remove=False):
+    """
+    Agrega (o elimina con remove=True) un favorito con un único INSERT ...
+    SELECT condicional (o DELETE) por clave primaria; las filas afectadas dicen
+    si cambió algo. Solo si no cambió se consulta por qué. Devuelve added,
+    exists, removed, not_favorite, user_not_found o not_found
+    """
+    model = FAVORITE_KINDS[kind]
+    fk = FAN_COLUMNS[model]
+    table = fk.table
+    user_exists = select(User.id).where(User.id == user_id).exists()
+    entity_exists = select(model.id).where(model.id == entity_id).exists()
+    if remove:
+        stmt = delete(table).where(table.c.user_id == user_id, fk == entity_id)
+    else:
+        stmt = insert_ignore(db.session, table).from_select(
+            ["user_id", fk.key],
+            select(literal(user_id), literal(entity_id)).where(user_exists, entity_exists),
+        )
+    try:
+        if db.session.execute(stmt).rowcount:
+            touch(kind, entity_id)
+            touch("users", user_id)
+            record_fans(kind, {entity_id: -1 if remove else 1})
+            db.session.commit()
+            return "removed" if remove else "added"
+        found_user, found_entity = db.session.execute(select(user_exists, entity_exists)).one()
+        db.session.rollback()
+    except Exception:
+        db.session.rollback()
+        raise
+    if not found_user:
+        return "user_not_found"
+    if not found_entity:
+        return "not_found"
+    return "not_favorite" if remove else "exists"
+
+
+def parse_items(data):
+    if not isinstance(data, dict) or not isinstance(data.get("items"), list):
+        raise APIException("se esperaba un objeto con la lista 'items'", status_code=400)
+    if len(data["items"]) > BULK_MAX_ITEMS:
+        raise APIException(f"máximo {BULK_MAX_ITEMS} items por request", status_code=400)
+
+    items = []
+    for raw in data["items"]:
+        item = {
+            "user_id": raw.get("user_id") if isinstance(raw, dict) else None,
+            "kind": raw.get("kind") if isinstance(raw, dict) else None,
+            "id": raw.get("id") if isinstance(raw, dict) else None,
+        }
+        valid = (
+            item["kind"] in FAVORITE_KINDS
+            and type(item["user_id"]) is int
+            and type(item["id"]) is int
+        )
+        item["status"] = None if valid else "invalid"
+        items.append(item)
+    return items
+
+
+def existing_ids(model, ids):
+    found = set()
+    for chunk in chunks(sorted(ids), CHUNK_SIZE):
+        found.update(db.session.execute(select(model.id).where(model.id.in_(chunk))).scalars())
+    return found
+
+
+def existing_pairs(fk, pairs, lock=False):
+    user_id = fk.table.c.user_id
+    found = set()
+    for chunk in chunks(sorted(pairs), CHUNK_SIZE):
+        stmt = select(user_id, fk).where(tuple_(user_id, fk).in_(chunk))
+        found.update(tuple(row) for row in db.session.execute(stmt.with_for_update() if lock else stmt))
+    return found
+
+
+def write_pairs(fk, pairs, remove=False):
+    """
+    Inserta (o borra) los pares (usuario, entidad) y devuelve los que la
+    sentencia realmente escribió, no los que una lectura previa suponía
+    """
+    table = fk.table
+    dialect = db.session.get_bind().dialect
+    returning = dialect.delete_returning if remove else dialect.insert_returning
+    if returning:
+        targets = pairs
+    else:
+        # MySQL no tiene RETURNING: se bloquean los pares (y los huecos de los
+        # que faltan) para que nadie los cambie entre la lectura y la escritura
+        current = existing_pairs(fk, pairs, lock=True)
+        targets = current if remove else pairs - current
+
+    written = set()
+    for chunk in chunks(sorted(targets), CHUNK_SIZE):
+        if remove:
+            stmt = delete(table).where(tuple_(table.c.user_id, fk).in_(chunk))
+        else:
+            stmt = insert_ignore(db.session, table).values(
+                [{"user_id": user_id, fk.key: entity_id} for user_id, entity_id in chunk]
+            )
+        if returning:
+            written.update(tuple(row) for row in db.session.execute(stmt.returning(table.c.user_id, fk)))
+        else:
+            db.session.execute(stmt)
+            written.update(chunk)
+    return written
+
+
+def apply_bulk(data, remove=False):
+    """
+    Agrega (o elimina con remove=True) todos los favoritos pedidos y hace un
+    único commit. Devuelve el estado de cada item en el mismo orden:
+    added, exists, removed, not_favorite, user_not_found, not_found o invalid.
+    Un par repetido en el mismo request cuenta una sola vez: las repeticiones
+    salen como exists / not_favorite
+    """
+    items = parse_items(data)
+    pending = [item for item in items if item["status"] is None]
+
+    users = existing_ids(User, {item["user_id"] for item in pending})
+    entities = {
+        kind: existing_ids(model, {item["id"] for item in pending if item["kind"] == kind})
+        for kind, model in FAVORITE_KINDS.items()
+    }
+    for item in pending:
+        if item["user_id"] not in users:
+            item["status"] = "user_not_found"
+        elif item["id"] not in entities[item["kind"]]:
+            item["status"] = "not_found"
+
+    try:
+        for kind, model in FAVORITE_KINDS.items():
+            kind_items = [item for item in pending if item["kind"] == kind and item["status"] is None]
+            pairs = {(item["user_id"], item["id"]) for item in kind_items}
+            if not pairs:
+                continue
+            written = write_pairs(FAN_COLUMNS[model], pairs, remove=remove)
+
+            unclaimed = set(written)
+            for item in kind_items:
+                pair = (item["user_id"], item["id"])
+                if pair in unclaimed:
+                    unclaimed.discard(pair)
+                    item["status"] = "removed" if remove else "added"
+                else:
+                    item["status"] = "not_favorite" if remove else "exists"
+            fans = Counter()
+            for user_id, entity_id in written:
+                touch(kind, entity_id)
+                touch("users", user_id)
+                fans[entity_id] += -1 if remove else 1
+            record_fans(kind, fans)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return items
@@ -0,0 +1,95 @@
+"""
+Cabecera `Idempotency-Key` para reintentos de escrituras: la primera respuesta
+(si no es un error 5xx) se guarda en la tabla `idempotency_key` y los
+reintentos con la misma clave la reciben de nuevo, con `Idempotent-Replayed:
+true`, sin volver a ejecutar el endpoint. La misma clave con otro método,
+ruta o cuerpo responde 422.
+
+La respuesta se guarda después del commit del endpoint. Si dos reintentos
+llegan a la vez los dos se ejecutan, pero los endpoints que usan esto son
+idempotentes en el estado (agregar o quitar un favorito dos veces deja lo
+mismo) y el segundo devuelve la respuesta guardada por el primero.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy import select, delete
+from utils import APIException, insert_ignore
+from models import db, IdempotencyKey
+
+MAX_KEY_LENGTH = 255
+
+
+def setup_idempotency(app):
+    app.config.setdefault('IDEMPOTENCY_TTL', float(os.environ.get('IDEMPOTENCY_TTL', 24 * 3600)))
+
+
+def request_fingerprint():
+    digest = hashlib.md5(f"{request.method} {request.full_path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def expiry_cutoff():
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    return now - timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+
+
+def find(key):
+    table = IdempotencyKey.__table__
+    return db.session.execute(
+        select(table.c.fingerprint, table.c.status, table.c.body)
+        .where(table.c.key == key, table.c.created_at >= expiry_cutoff())
+    ).first()
+
+
+def remember(key, fingerprint, response):
+    """Guarda la respuesta; si otro request guardó la clave antes devuelve la suya"""
+    table = IdempotencyKey.__table__
+    try:
+        # de paso se borran las vencidas (por el índice de created_at), incluida esta clave si lo estaba
+        db.session.execute(delete(table).where(table.c.created_at < expiry_cutoff()))
+        inserted = db.session.execute(insert_ignore(db.session, table), {
+            "key": key,
+            "fingerprint": fingerprint,
+            "status": response.status_code,
+            "body": response.get_data(as_text=True),
+            "created_at": datetime.now(timezone.utc).replace(tzinfo=None),
+        }).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return None if inserted else find(key)
+
+
+def replay(stored, fingerprint):
+    if stored.fingerprint != fingerprint:
+        raise APIException("la Idempotency-Key ya se usó con otro request", status_code=422)
+    response = current_app.response_class(stored.body, status=stored.status, mimetype=current_app.json.mimetype)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            raise APIException(f"Idempotency-Key debe tener entre 1 y {MAX_KEY_LENGTH} caracteres", status_code=400)
+        fingerprint = request_fingerprint()
+        stored = find(key)
+        if stored is not None:
+            return replay(stored, fingerprint)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code < 500:
+            stored = remember(key, fingerprint, response)
+            if stored is not None:
+                return replay(stored, fingerprint)
+        return response
+    return wrapper
@@ -0,0 +1,39 @@
+"""
+URLs de las imágenes de people, planets y species (la imagen comparte el id
+de su entidad). `GET /images/<kind>?ids=1,2,3` resuelve muchas en una sola
+consulta, para que el front no pida una por tarjeta.
+
+La respuesta trae `v`, un hash de su contenido. Pedida de nuevo con ese `v`
+el contenido no puede cambiar sin que cambie la URL, así que se sirve con
+`Cache-Control: immutable`; sin `v` (o con uno viejo) se cachea poco y se
+revalida con el ETag.
+"""
+import hashlib
+from sqlalchemy import select
+from utils import APIException, parse_ids
+from catalog import FAVORITE_KINDS, IMAGE_MODELS, read
+
+MAX_IDS = 500
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, max-age=60"
+
+
+def image_urls(kind, args):
+    """{"kind", "results": [{"id", "url"}], "missing": [ids sin imagen], "v"}"""
+    if kind not in FAVORITE_KINDS:
+        raise APIException(f"kind debe ser uno de: {', '.join(FAVORITE_KINDS)}", status_code=400)
+    ids = parse_ids(args.get("ids"), MAX_IDS)
+    image = IMAGE_MODELS[FAVORITE_KINDS[kind]].__table__
+    urls = dict(read(select(image.c.id, image.c.url).where(image.c.id.in_(ids))).all())
+    results = [{"id": entity_id, "url": urls[entity_id]} for entity_id in ids if entity_id in urls]
+    state = "\n".join(f"{item['id']} {item['url']}" for item in results)
+    return {
+        "kind": kind,
+        "results": results,
+        "missing": [entity_id for entity_id in ids if entity_id not in urls],
+        "v": hashlib.md5(state.encode()).hexdigest()[:16],
+    }
+
+
+def cache_control(body, args):
+    return IMMUTABLE if args.get("v") == body["v"] else REVALIDATE
@@ -0,0 +1,180 @@
+"""
+Ranking de los más favoritos, servido desde la tabla `favorite_count`
+(kind, entity_id, fans) en vez de un GROUP BY sobre los favoritos en cada request.
+
+Los contadores se mantienen en la misma transacción que la escritura, con
+incrementos: quien cambia favoritos sabe cuántas filas tocó y lo anota con
+`record_fans` (endpoints de favoritos, carga en bloque, borrado de usuarios);
+justo antes del commit se aplica un `fans = fans + delta` por entidad. Solo
+los cambios de colecciones hechos con el ORM (admin) se recuentan contra el
+índice inverso, y `rebuild_counts` recalcula todo. Al borrar una entidad se
+borra también su contador (`forget_counts`).
+"""
+from collections import Counter
+from sqlalchemy import event, inspect, select, delete, insert, update, func, literal, bindparam
+from sqlalchemy.orm import Session
+from utils import APIException, chunks, insert_ignore
+from models import db, User, FavoriteCount
+from catalog import FAN_COLUMNS, FAVORITE_KINDS, read
+from versions import touch, KIND_OF, COLLECTIONS
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+CHUNK_SIZE = 500
+
+
+def record_fans(kind, deltas, session=None):
+    """Anota cambios de fans ya escritos en la transacción actual: {entity_id: +n / -n}"""
+    session = session or db.session
+    session.info.setdefault("fan_deltas", {}).setdefault(kind, Counter()).update(deltas)
+
+
+def forget_counts(kind, entity_ids, session=None):
+    """Anota entidades borradas en la transacción actual: su contador se elimina"""
+    session = session or db.session
+    session.info.setdefault("fan_dropped", {}).setdefault(kind, set()).update(entity_ids)
+
+
+def recount(kind, entity_id, session):
+    session.info.setdefault("fan_recount", {}).setdefault(kind, set()).add(entity_id)
+
+
+def apply_deltas(session, kind, deltas):
+    """
+    Suma los deltas con un UPDATE atómico por entidad, sin leer los favoritos;
+    las entidades que ganan fans reciben antes su fila (en 0) si no la tenían
+    """
+    table = FavoriteCount.__table__
+    gained = sorted(entity_id for entity_id, delta in deltas.items() if delta > 0)
+    for chunk in chunks(gained, CHUNK_SIZE):
+        session.execute(insert_ignore(session, table), [{"kind": kind, "entity_id": i, "fans": 0} for i in chunk])
+    # en orden de id para que dos transacciones no se bloqueen en orden inverso
+    session.execute(
+        update(table)
+        .where(table.c.kind == kind, table.c.entity_id == bindparam("b_id"))
+        .values(fans=table.c.fans + bindparam("b_delta")),
+        [{"b_id": entity_id, "b_delta": delta} for entity_id, delta in sorted(deltas.items())],
+    )
+
+
+def store_counts(session, kind, ids):
+    """
+    Recuenta los fans de `ids` y los guarda. Las filas del contador se bloquean
+    (en orden) antes de contar, así dos transacciones que tocan la misma
+    entidad no pisan el recuento de la otra.
+    """
+    table = FavoriteCount.__table__
+    fk = FAN_COLUMNS[FAVORITE_KINDS[kind]]
+    for chunk in chunks(sorted(ids), CHUNK_SIZE):
+        session.execute(insert_ignore(session, table), [{"kind": kind, "entity_id": i, "fans": 0} for i in chunk])
+        session.execute(
+            select(table.c.entity_id)
+            .where(table.c.kind == kind, table.c.entity_id.in_(chunk))
+            .order_by(table.c.entity_id)
+            .with_for_update()
+        )
+        counts = dict(session.execute(select(fk, func.count()).where(fk.in_(chunk)).group_by(fk)).all())
+        session.execute(
+            update(table)
+            .where(table.c.kind == kind, table.c.entity_id == bindparam("b_id"))
+            .values(fans=bindparam("b_fans")),
+            [{"b_id": entity_id, "b_fans": counts.get(entity_id, 0)} for entity_id in chunk],
+        )
+
+
+def rebuild_counts(session=None):
+    """Recalcula todos los contadores (p. ej. después de insertar favoritos sin pasar por la API)"""
+    session = session or db.session
+    table = FavoriteCount.__table__
+    session.execute(delete(table))
+    for kind, model in FAVORITE_KINDS.items():
+        fk = FAN_COLUMNS[model]
+        session.execute(insert(table).from_select(
+            ["kind", "entity_id", "fans"],
+            select(literal(kind), fk, func.count()).group_by(fk),
+        ))
+
+
+@event.listens_for(Session, "before_flush")
+def _track_orm_deletes(session, flush_context, instances):
+    for obj in session.deleted:
+        if type(obj) is User:
+            # el ON DELETE CASCADE se lleva sus favoritos: se leen antes para descontarlos
+            for kind, model in FAVORITE_KINDS.items():
+                fk = FAN_COLUMNS[model]
+                ids = session.execute(select(fk).where(fk.table.c.user_id == obj.id)).scalars().all()
+                record_fans(kind, {entity_id: -1 for entity_id in ids}, session=session)
+                for entity_id in ids:
+                    touch(kind, entity_id, session=session)
+        elif KIND_OF.get(type(obj)) in FAVORITE_KINDS:
+            forget_counts(KIND_OF[type(obj)], [obj.id], session=session)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_orm_collections(session, flush_context):
+    # en after_flush el historial de las colecciones todavía es el del flush
+    for obj in list(session.new) + list(session.dirty):
+        if type(obj) not in COLLECTIONS:
+            continue
+        state = inspect(obj)
+        for attr in COLLECTIONS[type(obj)]:
+            history = state.attrs[attr].history
+            for related in list(history.added) + list(history.deleted):
+                entity = related if type(obj) is User else obj
+                recount(KIND_OF[type(entity)], entity.id, session)
+
+
+@event.listens_for(Session, "before_commit")
+def _store_fan_changes(session):
+    session.flush()
+    deltas = session.info.pop("fan_deltas", {})
+    recounts = session.info.pop("fan_recount", {})
+    dropped = session.info.pop("fan_dropped", {})
+    for kind, entity_ids in recounts.items():
+        entity_ids = entity_ids - dropped.get(kind, set())
+        if entity_ids:
+            store_counts(session, kind, entity_ids)
+    for kind, counter in deltas.items():
+        skip = recounts.get(kind, set()) | dropped.get(kind, set())
+        changes = {entity_id: delta for entity_id, delta in counter.items() if delta and entity_id not in skip}
+        if changes:
+            apply_deltas(session, kind, changes)
+    table = FavoriteCount.__table__
+    for kind, entity_ids in dropped.items():
+        for chunk in chunks(sorted(entity_ids), CHUNK_SIZE):
+            session.execute(delete(table).where(table.c.kind == kind, table.c.entity_id.in_(chunk)))
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_fan_changes(session):
+    for key in ("fan_deltas", "fan_recount", "fan_dropped"):
+        session.info.pop(key, None)
+
+
+def parse_args(args):
+    kind = args.get("kind")
+    if kind not in FAVORITE_KINDS:
+        raise APIException(f"kind debe ser uno de: {', '.join(FAVORITE_KINDS)}", status_code=400)
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise APIException("limit debe ser un número entero", status_code=400)
+    return kind, max(1, min(limit, MAX_LIMIT))
+
+
+def top_favorites(args):
+    kind, limit = parse_args(args)
+    counts = FavoriteCount.__table__.c
+    entities = FAVORITE_KINDS[kind].__table__
+    rows = read(
+        select(counts.entity_id, entities.c.name, counts.fans)
+        .join(entities, entities.c.id == counts.entity_id)
+        .where(counts.kind == kind, counts.fans > 0)
+        # mismo orden que el índice (kind, fans, entity_id) recorrido al revés
+        .order_by(counts.fans.desc(), counts.entity_id.desc())
+        .limit(limit)
+    )
+    return {
+        "kind": kind,
+        "results": [{"id": entity_id, "name": name, "fans": fans} for entity_id, name, fans in rows],
+    }
@@ -0,0 +1,203 @@
+"""
+Instrumentación por request: por cada ruta se mide el tiempo total, el tiempo
+en la base, cuántas consultas se ejecutaron, cuántas filas se leyeron y
+cuánto tomó serializar el JSON.
+
+- `X-Query-Count` y `X-Pool-Wait-Ms` en las respuestas en modo debug/testing
+  (o con QUERY_COUNT_HEADER=1).
+- `GET /metrics`: histogramas en formato de texto de Prometheus, más el estado
+  del pool de cada engine. Los valores son del proceso que responde; con varios
+  workers de gunicorn cada uno tiene los suyos.
+- Perfiles con cProfile, guardados en PROFILE_DIR como archivos .prof (se
+  abren con `python -m pstats` o snakeviz):
+  * requests con la cabecera `X-Profile: 1`, si PROFILE_HEADER=1 o en debug;
+  * requests que tarden más de PROFILE_SLOW_MS. Para eso se perfila cada
+    request, así que conviene activarlo solo mientras se investiga.
+"""
+import cProfile
+import os
+import threading
+import time
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from pool import request_pool_wait, pool_status
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 10000, 100000)
+
+
+class Histogram:
+    """Histograma acumulado por combinación de etiquetas, como los de Prometheus"""
+
+    def __init__(self, name, help_text, buckets, labels):
+        self.name, self.help_text, self.buckets, self.labels = name, help_text, buckets, labels
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for label_values, (counts, total, count) in sorted(self.series.items()):
+                labels = ",".join(f'{name}="{value}"' for name, value in zip(self.labels, label_values))
+                for bound, bucket in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket}')
+                lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{labels}}} {total:.6f}")
+                lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+ROUTE_LABELS = ("method", "route")
+
+HISTOGRAMS = {
+    "duration": Histogram("http_request_duration_seconds", "Tiempo total del request",
+                          DURATION_BUCKETS, ROUTE_LABELS + ("status",)),
+    "db": Histogram("http_request_db_seconds", "Tiempo ejecutando SQL", DURATION_BUCKETS, ROUTE_LABELS),
+    "queries": Histogram("http_request_queries", "Consultas SQL por request", COUNT_BUCKETS, ROUTE_LABELS),
+    "rows": Histogram("http_request_rows_fetched", "Filas leídas de la base", ROW_BUCKETS, ROUTE_LABELS),
+    "serialize": Histogram("http_request_serialization_seconds", "Tiempo serializando JSON",
+                           DURATION_BUCKETS, ROUTE_LABELS),
+}
+
+
+class CountingCursor:
+    """Envuelve el cursor DBAPI para contar las filas que se leen"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _count(self, rows):
+        if has_request_context():
+            g.rows_fetched = g.get("rows_fetched", 0) + rows
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._count(1)
+        return row
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._count(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._count(1)
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get("query_count", 0) + 1
+        context._metrics_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "_metrics_started", None)
+    if started is None or not has_request_context():
+        return
+    g.db_time = g.get("db_time", 0.0) + time.perf_counter() - started
+    if cursor.description is not None:
+        # el resultado se arma después de este evento y lee del cursor del contexto
+        context.cursor = CountingCursor(cursor)
+
+
+def query_count():
+    return g.get("query_count", 0)
+
+
+def record_serialization(seconds):
+    if has_request_context():
+        g.serialize_time = g.get("serialize_time", 0.0) + seconds
+
+
+def render_metrics(engines):
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines += histogram.render()
+    gauges = [("checked_out", "Conexiones en uso"), ("idle", "Conexiones libres"),
+              ("overflow", "Conexiones por encima de pool_size")]
+    for key, help_text in gauges:
+        lines += [f"# HELP db_pool_{key} {help_text}", f"# TYPE db_pool_{key} gauge"]
+        for bind, engine in engines.items():
+            status = pool_status(engine)
+            if key in status:
+                lines.append(f'db_pool_{key}{{bind="{bind or "default"}"}} {status[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def setup_metrics(app):
+    app.config.setdefault('QUERY_COUNT_HEADER', os.environ.get('QUERY_COUNT_HEADER') == '1')
+    app.config.setdefault('PROFILE_HEADER', os.environ.get('PROFILE_HEADER') == '1')
+    app.config.setdefault('PROFILE_SLOW_MS', float(os.environ.get('PROFILE_SLOW_MS', 0)))
+    app.config.setdefault('PROFILE_DIR', os.environ.get('PROFILE_DIR', '/tmp/starwars-profiles'))
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        asked = request.headers.get('X-Profile') == '1' and (app.debug or app.config['PROFILE_HEADER'])
+        if asked or app.config['PROFILE_SLOW_MS']:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # otro hilo ya está perfilando (un solo perfilador activo a la vez)
+                return
+            g.profiler, g.profile_asked = profiler, asked
+
+    @app.after_request
+    def add_query_count_header(response):
+        g.response_status = response.status_code
+        if app.debug or app.testing or app.config['QUERY_COUNT_HEADER']:
+            response.headers['X-Query-Count'] = str(query_count())
+            response.headers['X-Pool-Wait-Ms'] = f"{request_pool_wait() * 1000:.3f}"
+        return response
+
+    # en teardown para incluir las respuestas en streaming, que terminan después de after_request
+    @app.teardown_request
+    def record_request_metrics(exc):
+        started = g.get("request_started")
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        labels = (request.method, request.url_rule.rule if request.url_rule else "unmatched")
+        status = str(g.get("response_status", 500))
+        HISTOGRAMS["duration"].observe(elapsed, *labels, status)
+        HISTOGRAMS["db"].observe(g.get("db_time", 0.0), *labels)
+        HISTOGRAMS["queries"].observe(query_count(), *labels)
+        HISTOGRAMS["rows"].observe(g.get("rows_fetched", 0), *labels)
+        HISTOGRAMS["serialize"].observe(g.get("serialize_time", 0.0), *labels)
+
+        profiler = g.pop("profiler", None)
+        if profiler is not None:
+            profiler.disable()
+            slow = app.config['PROFILE_SLOW_MS'] and elapsed * 1000 >= app.config['PROFILE_SLOW_MS']
+            if g.get("profile_asked") or slow:
+                os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+                route = labels[1].strip("/").replace("/", "_").replace("<", "").replace(">", "").replace(":", "-")
+                name = f"{time.strftime('%Y%m%dT%H%M%S')}-{labels[0]}-{route or 'root'}-{elapsed * 1000:.0f}ms.prof"
+                profiler.dump_stats(os.path.join(app.config['PROFILE_DIR'], name))
@@ -1,28 +1,44 @@
+from datetime import datetime, timezone
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Boolean, ForeignKey, Integer, Numeric, Column, Table
+from sqlalchemy import String, Boolean, ForeignKey, Integer, Numeric, Column, Table, Index, literal_column
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 db = SQLAlchemy()
 
+
+def version_column():
+    """
+    Versión de la fila para concurrencia optimista: sube en cada UPDATE que no
+    la fije explícitamente (PUT, admin, carga masiva)
+    """
+    return mapped_column(nullable=False, default=1, server_default="1", onupdate=literal_column("version") + 1)
+
+# las filas de favoritos se borran en la base (ON DELETE CASCADE) junto con el
+# usuario o la entidad: las relaciones usan passive_deletes para que el ORM no
+# cargue la colección completa solo para vaciarla antes del DELETE
 user_planet_favorites = Table(
     "user_planet_favorites",
     db.metadata,
-    Column("user_id", ForeignKey("user.id"), primary_key=True),
-    Column("planet_id", ForeignKey("planets.id"), primary_key=True)
+    Column("user_id", ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("planet_id", ForeignKey("planets.id", ondelete="CASCADE"), primary_key=True),
+    # la clave primaria empieza por user_id: este índice sirve las búsquedas de fans
+    Index("ix_user_planet_favorites_planet_id", "planet_id", "user_id")
 )
 
 user_species_favorites = Table(
     "user_species_favorites",
     db.metadata,
-    Column("user_id", ForeignKey("user.id"), primary_key=True),
-    Column("species_id", ForeignKey("species.id"), primary_key=True)
+    Column("user_id", ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("species_id", ForeignKey("species.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_user_species_favorites_species_id", "species_id", "user_id")
 )
 
 user_people_favorites = Table(
     "user_people_favorites",
     db.metadata,
-    Column("user_id", ForeignKey("user.id"), primary_key=True),
-    Column("person_id", ForeignKey("people.id"), primary_key=True)
+    Column("user_id", ForeignKey("user.id", ondelete="CASCADE"), primary_key=True),
+    Column("person_id", ForeignKey("people.id", ondelete="CASCADE"), primary_key=True),
+    Index("ix_user_people_favorites_person_id", "person_id", "user_id")
 )
 
 
@@ -34,9 +50,9 @@ class User(db.Model):
     age: Mapped[int] = mapped_column(nullable=False)
     nickname: Mapped[str] = mapped_column(unique=True, nullable=False)
     is_active: Mapped[bool] = mapped_column(nullable=False)  
-    favorite_planets: Mapped[list["Planets"]] = relationship("Planets", secondary=user_planet_favorites, back_populates="fans")
-    favorite_species: Mapped[list["Species"]] = relationship("Species", secondary=user_species_favorites, back_populates="fans")
-    favorite_people: Mapped[list["People"]] = relationship("People", secondary=user_people_favorites, back_populates="fans")
+    favorite_planets: Mapped[list["Planets"]] = relationship("Planets", secondary=user_planet_favorites, back_populates="fans", passive_deletes=True)
+    favorite_species: Mapped[list["Species"]] = relationship("Species", secondary=user_species_favorites, back_populates="fans", passive_deletes=True)
+    favorite_people: Mapped[list["People"]] = relationship("People", secondary=user_people_favorites, back_populates="fans", passive_deletes=True)
 
     def serialize(self):
         return {
@@ -68,7 +84,15 @@ class People(db.Model):
     hair_color: Mapped[str] = mapped_column(nullable=False)
     mass: Mapped[int] = mapped_column(nullable=False)
     skin_color: Mapped[str] = mapped_column(nullable=False)
-    fans: Mapped[list["User"]] = relationship("User", secondary=user_people_favorites, back_populates="favorite_people")
+    version: Mapped[int] = version_column()
+    fans: Mapped[list["User"]] = relationship("User", secondary=user_people_favorites, back_populates="favorite_people", passive_deletes=True)
+
+    # índices (columna, id) para filtros y orden con paginación por keyset
+    __table_args__ = (
+        Index("ix_people_name_id", "name", "id"),
+        Index("ix_people_gender_id", "gender", "id"),
+        Index("ix_people_height_id", "height", "id"),
+    )
 
 
     def serialize(self):
@@ -82,6 +106,7 @@ class People(db.Model):
             "hair_color": self.hair_color,
             "mass": self.mass,
             "skin_color": self.skin_color,
+            "version": self.version,
             "fans": [fan.serialize_favorites() for fan in self.fans]            
         }  
     
@@ -102,7 +127,15 @@ class Planets(db.Model):
     orbital_period: Mapped[int] = mapped_column(nullable=False)
     terrain: Mapped[str] = mapped_column(nullable=False)
     rotation_period: Mapped[int] = mapped_column(nullable=False)
-    fans: Mapped[list["User"]] = relationship("User", secondary=user_planet_favorites, back_populates="favorite_planets")
+    version: Mapped[int] = version_column()
+    fans: Mapped[list["User"]] = relationship("User", secondary=user_planet_favorites, back_populates="favorite_planets", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_planets_name_id", "name", "id"),
+        Index("ix_planets_climate_id", "climate", "id"),
+        Index("ix_planets_terrain_id", "terrain", "id"),
+        Index("ix_planets_population_id", "population", "id"),
+    )
 
     def serialize(self):
         return {
@@ -116,6 +149,7 @@ class Planets(db.Model):
             "orbital_period": self.orbital_period,
             "terrain": self.terrain,
             "rotation_period": self.rotation_period,
+            "version": self.version,
             "fans": [fan.serialize_favorites() for fan in self.fans],
         }  
     
@@ -136,7 +170,14 @@ class Species(db.Model):
     designation: Mapped[str] = mapped_column(nullable=False)
     eye_colors: Mapped[str] = mapped_column(nullable=False)
     hair_colors: Mapped[str] = mapped_column(nullable=False)
-    fans: Mapped[list["User"]] = relationship("User", secondary=user_species_favorites, back_populates="favorite_species")
+    version: Mapped[int] = version_column()
+    fans: Mapped[list["User"]] = relationship("User", secondary=user_species_favorites, back_populates="favorite_species", passive_deletes=True)
+
+    __table_args__ = (
+        Index("ix_species_name_id", "name", "id"),
+        Index("ix_species_classification_id", "classification", "id"),
+        Index("ix_species_language_id", "language", "id"),
+    )
 
     def serialize(self):
         return {
@@ -150,6 +191,7 @@ class Species(db.Model):
             "designation": self.designation,
             "eye_colors": self.eye_colors,
             "hair_colors": self.hair_colors,
+            "version": self.version,
             "fans": [fan.serialize_favorites() for fan in self.fans],
         }  
     
@@ -187,4 +229,44 @@ class ImgSpecies(db.Model):
         return{
             "id": self.id,
             "url": self.url,
-        }
\ No newline at end of file
+        }
+
+class TableVersion(db.Model):
+    name: Mapped[str] = mapped_column(primary_key=True)
+    version: Mapped[int] = mapped_column(nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(nullable=False, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    def serialize(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "updated_at": self.updated_at.isoformat(),
+        }
+
+
+class FavoriteCount(db.Model):
+    __tablename__ = "favorite_count"
+    kind: Mapped[str] = mapped_column(primary_key=True)
+    entity_id: Mapped[int] = mapped_column(primary_key=True)
+    fans: Mapped[int] = mapped_column(nullable=False)
+
+    __table_args__ = (
+        Index("ix_favorite_count_kind_fans", "kind", "fans", "entity_id"),
+    )
+
+    def serialize(self):
+        return {
+            "kind": self.kind,
+            "id": self.entity_id,
+            "fans": self.fans,
+        }
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_key"
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    # hash del método, la ruta y el cuerpo: la misma clave con otro request es un error
+    fingerprint: Mapped[str] = mapped_column(String(32), nullable=False)
+    status: Mapped[int] = mapped_column(nullable=False)
+    body: Mapped[str] = mapped_column(nullable=False)
+    created_at: Mapped[datetime] = mapped_column(nullable=False, index=True)
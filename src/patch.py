@@ -0,0 +1,77 @@
+"""
+Actualización parcial (PATCH) de people, planets y species: un único
+UPDATE ... WHERE id = ? RETURNING con solo las columnas recibidas, sin cargar
+el objeto del ORM ni serializar sus fans.
+
+Concurrencia optimista con la columna `version`: si el cuerpo trae `version`
+el UPDATE solo se aplica cuando coincide con la de la fila, y si no responde
+409 con la versión actual. La versión nueva va en `X-Entity-Version`, también
+en las respuestas 204 de `Prefer: return=minimal`.
+"""
+from sqlalchemy import select, update
+from utils import APIException
+from models import db
+from bulk import REQUIRED_FIELDS, valid_value
+from versions import touch, touch_name
+
+
+def parse_patch(model, data):
+    """Devuelve (valores a escribir, versión esperada o None)"""
+    if not isinstance(data, dict):
+        raise APIException("se esperaba un objeto JSON", status_code=400)
+    values = dict(data)
+    expected = values.pop("version", None)
+    if expected is not None and type(expected) is not int:
+        raise APIException("version debe ser un número entero", status_code=400)
+    unknown = [field for field in values if field not in REQUIRED_FIELDS[model]]
+    if unknown:
+        raise APIException(f"campos desconocidos: {', '.join(unknown)}", status_code=400)
+    if not values:
+        raise APIException("no hay campos para actualizar", status_code=400)
+    nulls = [field for field, value in values.items() if value is None]
+    if nulls:
+        raise APIException(f"no pueden ser null: {', '.join(nulls)}", status_code=400)
+    wrong = [field for field, value in values.items() if not valid_value(model.__table__.c[field], value)]
+    if wrong:
+        raise APIException(f"campos con tipo inválido: {', '.join(wrong)}", status_code=400)
+    return values, expected
+
+
+def patch_entity(model, entity_id, data):
+    """
+    Aplica el PATCH y devuelve {id, version, campos actualizados}, o None si
+    la entidad no existe
+    """
+    values, expected = parse_patch(model, data)
+    table = model.__table__
+    stmt = update(table).where(table.c.id == entity_id).values(**values, version=table.c.version + 1)
+    if expected is not None:
+        stmt = stmt.where(table.c.version == expected)
+    returned = [table.c.id, table.c.version] + [table.c[field] for field in values]
+
+    try:
+        if db.session.get_bind().dialect.update_returning:
+            row = db.session.execute(stmt.returning(*returned)).first()
+        else:
+            # MySQL no tiene UPDATE ... RETURNING: se lee la fila en la misma transacción
+            row = None
+            if db.session.execute(stmt).rowcount:
+                row = db.session.execute(select(*returned).where(table.c.id == entity_id)).first()
+        if row is None:
+            current = db.session.execute(select(table.c.version).where(table.c.id == entity_id)).scalar()
+            db.session.rollback()
+            if current is None:
+                return None
+            raise APIException("la entidad cambió desde que se leyó", status_code=409, payload={"version": current})
+        touch(model.__tablename__, entity_id)
+        if "name" in values:
+            touch_name(model.__tablename__, entity_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return dict(row._mapping)
+
+
+def wants_minimal(request):
+    return "return=minimal" in request.headers.get("Prefer", "")
@@ -0,0 +1,135 @@
+"""
+Configuración del pool de conexiones desde variables de entorno y métricas
+del pool para dimensionar los workers de gunicorn contra `max_connections`.
+
+Variables (todas opcionales, junto a DATABASE_URL):
+- DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10), DB_POOL_TIMEOUT (30 s)
+- DB_POOL_RECYCLE (1800 s, -1 para no reciclar), DB_POOL_PRE_PING (1)
+- DB_STATEMENT_TIMEOUT en milisegundos (0 = sin límite)
+
+Cada proceso abre como mucho DB_POOL_SIZE + DB_MAX_OVERFLOW conexiones por
+engine, así que workers * ese número tiene que quedar por debajo de
+`max_connections` del servidor.
+
+En SQLite además se activan las FOREIGN KEY en cada conexión nueva: sin eso
+no se aplican los ON DELETE CASCADE de las tablas de favoritos.
+"""
+import os
+import threading
+import time
+from flask import g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mide cuánto se espera para obtener una conexión"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self.stats.lock:
+                self.stats.timeouts += 1
+            raise
+        finally:
+            self.stats.waited(time.perf_counter() - start)
+
+    def _create_connection(self):
+        with self.stats.lock:
+            self.stats.connects += 1
+        return super()._create_connection()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class PoolStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = self.timeouts = self.connects = 0
+        self.wait_total = self.wait_max = 0.0
+
+    def waited(self, seconds):
+        with self.lock:
+            self.checkouts += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+        if has_request_context():
+            g.pool_wait = g.get("pool_wait", 0.0) + seconds
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "wait_ms_total": round(self.wait_total * 1000, 3),
+                "wait_ms_avg": round(self.wait_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.wait_max * 1000, 3),
+            }
+
+
+def engine_options(database_url):
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # en memoria Flask-SQLAlchemy usa un StaticPool: una sola conexión
+        return {}
+    options = {
+        "poolclass": TimedQueuePool,
+        "pool_size": env_int("DB_POOL_SIZE", 5),
+        "max_overflow": env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": env_int("DB_POOL_TIMEOUT", 30),
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 1800),
+        "pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1") == "1",
+    }
+    statement_timeout = env_int("DB_STATEMENT_TIMEOUT", 0)
+    if statement_timeout:
+        if url.get_backend_name() == "postgresql":
+            options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout}"}
+        elif url.get_backend_name() == "mysql":
+            options["connect_args"] = {"init_command": f"SET SESSION max_execution_time={statement_timeout}"}
+    return options
+
+
+@event.listens_for(Engine, "connect")
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # sqlite3 o el adaptador de aiosqlite del engine async
+    if "sqlite" in type(dbapi_connection).__module__:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def pool_status(engine):
+    pool = engine.pool
+    status = {"url": engine.url.render_as_string(hide_password=True), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "idle": pool.checkedin(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": pool._max_overflow,
+            "max_connections_per_worker": pool.size() + max(pool._max_overflow, 0),
+        })
+    if isinstance(pool, TimedQueuePool):
+        status.update(pool.stats.as_dict())
+    return status
+
+
+def request_pool_wait():
+    """Segundos que el request actual esperó por conexiones"""
+    return g.get("pool_wait", 0.0)
@@ -0,0 +1,129 @@
+"""
+Lecturas en réplicas: si `DATABASE_REPLICA_URLS` tiene una o más URLs (separadas
+por comas), los GET leen de una réplica y todo lo demás sigue en el primario.
+
+- Las réplicas son binds de Flask-SQLAlchemy (`replica_0`, `replica_1`, ...),
+  con las mismas opciones de pool que el primario y visibles en /db/pool.
+- `DATABASE_REPLICA_POLICY`: round_robin (por defecto) o least_busy (la
+  réplica con menos conexiones en uso en este proceso).
+- Read-your-writes: un request que hace commit deja la cookie `db_primary`
+  durante `DATABASE_REPLICA_STICKY_SECONDS`; mientras el cliente la envíe sus
+  GET van al primario y ve sus propias escrituras aunque la réplica vaya atrás.
+- Si una réplica no acepta conexiones el request lee del primario.
+
+Solo las lecturas que pasan por `catalog.read` usan la réplica; la sesión del
+ORM (`db.session`) siempre está en el primario.
+"""
+import itertools
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from models import db
+from pool import engine_options
+
+STICKY_COOKIE = "db_primary"
+
+# conexión fijada por quien llama (p. ej. el servidor ASGI), tiene prioridad
+_bound_connection = ContextVar("bound_connection", default=None)
+
+
+class ReplicaRouter:
+    def __init__(self, binds, policy="round_robin"):
+        if policy not in ("round_robin", "least_busy"):
+            raise ValueError(f"DATABASE_REPLICA_POLICY desconocida: {policy}")
+        self.binds = binds
+        self.policy = policy
+        self._counter = itertools.count()
+
+    def choose(self):
+        if self.policy == "least_busy":
+            return min(self.binds, key=lambda bind: getattr(db.engines[bind].pool, "checkedout", lambda: 0)())
+        return self.binds[next(self._counter) % len(self.binds)]
+
+
+def setup_replicas(app):
+    """Tiene que llamarse antes de `db.init_app(app)` para registrar los binds"""
+    app.config.setdefault('DATABASE_REPLICA_URLS', os.environ.get('DATABASE_REPLICA_URLS', ''))
+    app.config.setdefault('DATABASE_REPLICA_POLICY', os.environ.get('DATABASE_REPLICA_POLICY', 'round_robin'))
+    app.config.setdefault('DATABASE_REPLICA_STICKY_SECONDS', int(os.environ.get('DATABASE_REPLICA_STICKY_SECONDS', 5)))
+    urls = [url.strip().replace("postgres://", "postgresql://")
+            for url in app.config['DATABASE_REPLICA_URLS'].split(",") if url.strip()]
+    if not urls:
+        return
+    binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+    for index, url in enumerate(urls):
+        binds[f"replica_{index}"] = {"url": url, **engine_options(url)}
+    router = ReplicaRouter([f"replica_{index}" for index in range(len(urls))], app.config['DATABASE_REPLICA_POLICY'])
+    app.extensions['replicas'] = router
+
+    @app.before_request
+    def choose_replica():
+        if request.method in ("GET", "HEAD") and STICKY_COOKIE not in request.cookies:
+            g.replica_bind = router.choose()
+
+    @app.after_request
+    def stick_to_primary(response):
+        if g.get("db_wrote"):
+            response.set_cookie(STICKY_COOKIE, "1", max_age=app.config['DATABASE_REPLICA_STICKY_SECONDS'],
+                                httponly=True, samesite="Lax")
+        response.headers['X-Read-From'] = g.get("replica_bind") or "primary"
+        return response
+
+    @app.teardown_request
+    def close_replica(exc):
+        conn = g.pop("replica_conn", None)
+        if conn is not None:
+            conn.close()
+
+
+def read_connection():
+    """Conexión para los SELECT de `read`: la réplica del request o la sesión del primario"""
+    bound = _bound_connection.get()
+    if bound is not None:
+        return bound
+    if not has_request_context() or not g.get("replica_bind") or g.get("use_primary"):
+        return db.session.connection()
+    conn = g.get("replica_conn")
+    if conn is None:
+        try:
+            conn = g.replica_conn = db.engines[g.replica_bind].connect()
+        except OperationalError:
+            g.replica_bind = None
+            return db.session.connection()
+    return conn
+
+
+@contextmanager
+def using_connection(conn):
+    """Hace que `read` use `conn` dentro del bloque"""
+    token = _bound_connection.set(conn)
+    try:
+        yield conn
+    finally:
+        _bound_connection.reset(token)
+
+
+@contextmanager
+def primary():
+    """Fuerza que las lecturas dentro del bloque vayan al primario"""
+    if not has_request_context():
+        yield
+        return
+    previous = g.get("use_primary")
+    g.use_primary = True
+    try:
+        yield
+    finally:
+        g.use_primary = previous
+
+
+@event.listens_for(Session, "before_commit")
+def _mark_write(session):
+    if not has_request_context():
+        return
+    if session.new or session.dirty or session.deleted or session.info.get("touched") or session.info.get("created"):
+        g.db_wrote = True
@@ -0,0 +1,161 @@
+"""
+Búsqueda de texto completo sobre name/description de people, planets y species.
+
+- PostgreSQL: columna generada `search_vector` (tsvector, name con peso A y
+  description con peso B) con índice GIN en cada tabla; se ordena por ts_rank_cd.
+- SQLite: tabla FTS5 `catalog_search` mantenida por triggers; se ordena por bm25.
+  El rowid codifica la entidad (id * 4 + código del tipo) para que los
+  triggers actualicen/borren por clave y no recorriendo la tabla.
+
+En ambos casos el índice se actualiza en la misma sentencia que escribe la
+fila, así que los endpoints de alta/edición/borrado (y la carga masiva y el
+admin) lo mantienen sincronizado sin código extra.
+"""
+import re
+from sqlalchemy import select, func, literal, union_all, text, column, bindparam
+from utils import APIException
+from models import db, People, Planets, Species
+from catalog import read
+from replicas import read_connection
+
+SEARCH_KINDS = {
+    "people": (People, 1),
+    "planets": (Planets, 2),
+    "species": (Species, 3),
+}
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def is_search_object(name, type_):
+    """
+    Objetos de la búsqueda que crean las migraciones con SQL propio y no están
+    en los modelos (la tabla FTS5 y sus tablas internas, o la columna generada
+    y su índice GIN): autogenerate no debe proponer borrarlos
+    """
+    if type_ == "table":
+        return name == "catalog_search" or name.startswith("catalog_search_")
+    if type_ == "column":
+        return name == "search_vector"
+    if type_ == "index":
+        return name.endswith("_search_vector")
+    return False
+
+
+def sqlite_ddl():
+    statements = ["""
+        CREATE VIRTUAL TABLE IF NOT EXISTS catalog_search USING fts5(
+            name, description, tokenize = 'unicode61 remove_diacritics 2'
+        )
+    """]
+    for kind, (_, code) in SEARCH_KINDS.items():
+        statements += [
+            f"""CREATE TRIGGER IF NOT EXISTS {kind}_search_insert AFTER INSERT ON {kind} BEGIN
+                INSERT INTO catalog_search (rowid, name, description) VALUES (new.id * 4 + {code}, new.name, new.description);
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {kind}_search_update AFTER UPDATE OF id, name, description ON {kind} BEGIN
+                DELETE FROM catalog_search WHERE rowid = old.id * 4 + {code};
+                INSERT INTO catalog_search (rowid, name, description) VALUES (new.id * 4 + {code}, new.name, new.description);
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS {kind}_search_delete AFTER DELETE ON {kind} BEGIN
+                DELETE FROM catalog_search WHERE rowid = old.id * 4 + {code};
+            END""",
+        ]
+    return statements
+
+
+_sqlite_ready = set()
+
+
+def ensure_sqlite_index(engine):
+    """
+    Crea la tabla FTS5 y sus triggers si no existen (por ejemplo en la base de
+    desarrollo creada con create_all) y la llena con lo que ya hay
+    """
+    if engine.url in _sqlite_ready:
+        return
+    with engine.begin() as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'catalog_search'"
+        )).first()
+        if not exists:
+            for statement in sqlite_ddl():
+                conn.execute(text(statement))
+            for kind, (_, code) in SEARCH_KINDS.items():
+                conn.execute(text(
+                    f"INSERT INTO catalog_search (rowid, name, description) "
+                    f"SELECT id * 4 + {code}, name, description FROM {kind}"
+                ))
+    _sqlite_ready.add(engine.url)
+
+
+def parse_query(args):
+    q = (args.get("q") or "").strip()
+    if not q:
+        raise APIException("el parámetro q es obligatorio", status_code=400)
+    kinds = [kind.strip() for kind in args.get("kinds", "").split(",") if kind.strip()] or list(SEARCH_KINDS)
+    unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+    if unknown:
+        raise APIException(f"tipos desconocidos: {', '.join(unknown)}", status_code=400)
+    try:
+        limit = int(args.get("limit", DEFAULT_LIMIT))
+    except ValueError:
+        raise APIException("limit debe ser un número entero", status_code=400)
+    return q, kinds, max(1, min(limit, MAX_LIMIT))
+
+
+def fts5_query(q):
+    """Cada palabra como término literal (AND); la última también como prefijo"""
+    words = re.findall(r"\w+", q)
+    if not words:
+        raise APIException("la búsqueda no tiene palabras", status_code=400)
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_sqlite(q, kinds, limit):
+    ensure_sqlite_index(read_connection().engine)
+    codes = {code: kind for kind, (_, code) in SEARCH_KINDS.items() if kind in kinds}
+    stmt = text(
+        "SELECT rowid, name, bm25(catalog_search, 10.0, 1.0) AS score FROM catalog_search "
+        "WHERE catalog_search MATCH :q AND rowid % 4 IN :codes ORDER BY score LIMIT :limit"
+    ).bindparams(bindparam("codes", expanding=True))
+    rows = read(stmt.bindparams(q=fts5_query(q), codes=list(codes), limit=limit))
+    return [
+        {"kind": codes[rowid % 4], "id": rowid // 4, "name": name, "rank": round(-score, 4)}
+        for rowid, name, score in rows
+    ]
+
+
+def search_postgresql(q, kinds, limit):
+    query = func.websearch_to_tsquery("simple", q)
+    selects = []
+    for kind in kinds:
+        table = SEARCH_KINDS[kind][0].__table__
+        vector = column("search_vector")
+        selects.append(
+            select(literal(kind).label("kind"), table.c.id, table.c.name,
+                   func.ts_rank_cd(vector, query).label("rank"))
+            .select_from(table)
+            .where(vector.op("@@")(query))
+        )
+    hits = union_all(*selects).subquery()
+    rows = read(select(hits).order_by(hits.c.rank.desc(), hits.c.kind, hits.c.id).limit(limit))
+    return [
+        {"kind": kind, "id": entity_id, "name": name, "rank": round(rank, 4)}
+        for kind, entity_id, name, rank in rows
+    ]
+
+
+def search(args):
+    q, kinds, limit = parse_query(args)
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "postgresql":
+        results = search_postgresql(q, kinds, limit)
+    elif dialect == "sqlite":
+        results = search_sqlite(q, kinds, limit)
+    else:
+        raise APIException(f"búsqueda no disponible en {dialect}", status_code=501)
+    return {"q": q, "results": results}
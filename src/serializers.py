@@ -0,0 +1,84 @@
+"""
+Serializadores generados una sola vez a partir de las columnas mapeadas.
+
+- row_serializer(fields): convierte un `Row` (tupla) en dict por posición, sin
+  construir objetos del ORM.
+- model_serializer(model): convierte una instancia leyendo su `__dict__`, sin
+  pasar por los descriptores instrumentados de SQLAlchemy.
+- dumps(): usa orjson si está instalado y si no el json de la librería estándar.
+  `setup_json(app)` hace que jsonify y la caché usen ese mismo encoder.
+"""
+import json
+import time
+from functools import lru_cache
+from flask.json.provider import DefaultJSONProvider
+from metrics import record_serialization
+
+try:
+    import orjson
+    # fechas y dataclasses pasan por el `default` de Flask para que la salida sea la misma
+    ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+except ImportError:
+    orjson = None
+
+
+@lru_cache(maxsize=None)
+def row_serializer(fields):
+    """`fields` es una tupla con los nombres de columna en el orden del SELECT"""
+    body = ", ".join(f"{name!r}: row[{index}]" for index, name in enumerate(fields))
+    namespace = {}
+    exec(f"def serialize(row):\n    return {{{body}}}\n", namespace)
+    return namespace["serialize"]
+
+
+@lru_cache(maxsize=None)
+def model_serializer(model):
+    fields = [column.key for column in model.__table__.columns]
+    body = ", ".join(f"{name!r}: d[{name!r}]" for name in fields)
+    slow_body = ", ".join(f"{name!r}: obj.{name}" for name in fields)
+    namespace = {}
+    exec(
+        "def serialize(obj):\n"
+        "    d = obj.__dict__\n"
+        "    try:\n"
+        f"        return {{{body}}}\n"
+        "    except KeyError:\n"
+        # atributos expirados o sin cargar: que el ORM los traiga
+        f"        return {{{slow_body}}}\n",
+        namespace,
+    )
+    return namespace["serialize"]
+
+
+def dumps(payload):
+    started = time.perf_counter()
+    if orjson is not None:
+        text = orjson.dumps(payload, default=DefaultJSONProvider.default, option=ORJSON_OPTIONS).decode()
+    else:
+        text = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    record_serialization(time.perf_counter() - started)
+    return text
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Igual que el provider de Flask pero con orjson para dicts/listas simples"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            # jsonify siempre pasa separators (e indent si la salida es legible);
+            # la de orjson ya es compacta, cualquier otra opción va por el json estándar
+            compact = kwargs.get("indent") is None and kwargs.get("separators") in (None, (",", ":"))
+            others = set(kwargs) - {"indent", "separators"}
+            if orjson is not None and compact and not others:
+                try:
+                    return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode()
+                except TypeError:
+                    pass
+            return super().dumps(obj, **kwargs)
+        finally:
+            record_serialization(time.perf_counter() - started)
+
+
+def setup_json(app):
+    app.json = FastJSONProvider(app)
@@ -1,4 +1,4 @@
-from flask import jsonify, url_for
+from flask import jsonify, url_for, Response, stream_with_context, current_app
 
 class APIException(Exception):
     status_code = 400
@@ -39,3 +39,64 @@ def generate_sitemap(app):
         <p>Start working on your proyect by following the <a href="https://start.4geeksacademy.com/starters/flask" target="_blank">Quick Start</a></p>
         <p>Remember to specify a real endpoint path like: </p>
         <ul style="text-align: left;">"""+links_html+"</ul></div>"
+
+
+def dialect_insert(session, table):
+    """INSERT del dialecto activo, para poder usar ON CONFLICT en PostgreSQL y SQLite"""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert
+    else:
+        from sqlalchemy import insert
+    return insert(table)
+
+
+def insert_ignore(session, table):
+    """INSERT que ignora las filas que ya existen (ON CONFLICT DO NOTHING / INSERT IGNORE)"""
+    stmt = dialect_insert(session, table)
+    if hasattr(stmt, "on_conflict_do_nothing"):
+        return stmt.on_conflict_do_nothing()
+    if session.get_bind().dialect.name == "mysql":
+        return stmt.prefix_with("IGNORE")
+    return stmt
+
+
+def parse_ids(raw, max_ids):
+    """`ids=1,2,3` de la query string: lista ordenada y sin repetidos"""
+    try:
+        ids = sorted({int(value) for value in (raw or "").split(",") if value.strip()})
+    except ValueError:
+        raise APIException("ids debe ser una lista de números separados por coma", status_code=400)
+    if not ids:
+        raise APIException("es necesario proporcionar ids", status_code=400)
+    if len(ids) > max_ids:
+        raise APIException(f"máximo {max_ids} ids por consulta", status_code=400)
+    return ids
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def wants_stream(request):
+    """El cliente pide NDJSON con `Accept: application/x-ndjson` o con `?stream=1`"""
+    if request.args.get("stream") == "1":
+        return True
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def ndjson_response(lines):
+    return Response(stream_with_context(lines), mimetype=NDJSON_MIMETYPE)
+
+
+def json_response(body, status=200):
+    """Respuesta a partir de un JSON ya serializado (por ejemplo desde la caché)"""
+    return current_app.response_class(body + "\n", status=status, mimetype=current_app.json.mimetype)
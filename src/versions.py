@@ -0,0 +1,244 @@
+"""
+Versiones por tabla para saber si algo cambió sin consultar los datos, y
+respuestas condicionales (ETag / Last-Modified) construidas a partir de ellas.
+
+Las escrituras marcan con `touch(kind, id)` lo que modifican; los cambios
+hechos con el ORM (incluido el admin) se detectan solos en `before_flush`.
+Justo antes del commit se incrementa `table_version` en la misma transacción,
+y después del commit se invalida la caché de lo tocado.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.orm import Session
+from flask import g, has_app_context, request, make_response
+from models import db, User, People, Planets, Species, ImgPeople, ImgPlanets, ImgSpecies, TableVersion
+from utils import insert_ignore
+from cache import invalidate_many, committed
+from replicas import read_connection
+
+KIND_OF = {
+    People: "people",
+    Planets: "planets",
+    Species: "species",
+    User: "users",
+}
+
+# una imagen cambia el `image_url` de su entidad (mismo id) y la respuesta de /images
+IMAGE_KIND_OF = {
+    ImgPeople: "people",
+    ImgPlanets: "planets",
+    ImgSpecies: "species",
+}
+
+COLLECTIONS = {
+    People: ["fans"],
+    Planets: ["fans"],
+    Species: ["fans"],
+    User: ["favorite_planets", "favorite_species", "favorite_people"],
+}
+
+
+COMMIT_HOOKS = []
+
+
+def names_kind(kind):
+    """Versión aparte para los nombres: solo la tocan altas, bajas y cambios de `name`"""
+    return f"names:{kind}"
+
+
+def touch(kind, entity_id=None, session=None, created=False):
+    """
+    Marca `kind` (y opcionalmente la entidad; sin ella, todas) como modificado
+    en la transacción actual. Las filas nuevas se anotan aparte con
+    created=True: solo cambian las listas de la caché, pero el índice de
+    autocompletado sí necesita sus ids.
+    """
+    session = session or db.session
+    session.info.setdefault("created" if created else "touched", set()).add((kind, entity_id))
+
+
+def touch_name(kind, entity_id, session=None, created=False):
+    """Marca que cambió (o apareció, o se borró) el nombre de la entidad"""
+    touch(names_kind(kind), entity_id, session=session, created=created)
+
+
+def on_commit(hook):
+    """Registra `hook(touched, created, versions)` para después de cada commit"""
+    COMMIT_HOOKS.append(hook)
+    return hook
+
+
+def _touch_image(obj, session):
+    touch(IMAGE_KIND_OF[type(obj)], obj.id, session=session)
+    touch("images", session=session)
+
+
+@event.listens_for(Session, "before_flush")
+def _track_orm_changes(session, flush_context, instances):
+    for obj in list(session.dirty) + list(session.deleted):
+        if type(obj) in IMAGE_KIND_OF:
+            _touch_image(obj, session)
+    for obj in session.dirty:
+        if type(obj) not in KIND_OF or not session.is_modified(obj):
+            continue
+        touch(KIND_OF[type(obj)], obj.id, session=session)
+        state = inspect(obj)
+        if type(obj) is User and any(state.attrs[attr.key].history.has_changes() for attr in state.mapper.column_attrs):
+            # email o nickname aparecen en los fans de las entidades que sigue
+            session.info["profiles"] = True
+        elif type(obj) is not User and state.attrs.name.history.has_changes():
+            touch_name(KIND_OF[type(obj)], obj.id, session=session)
+        for attr in COLLECTIONS[type(obj)]:
+            history = state.attrs[attr].history
+            for related in list(history.added) + list(history.deleted):
+                touch(KIND_OF[type(related)], related.id, session=session)
+    for obj in session.deleted:
+        if type(obj) not in KIND_OF:
+            continue
+        touch(KIND_OF[type(obj)], obj.id, session=session)
+        # al borrar se van también sus filas de favoritos, que se ven del otro lado
+        if type(obj) is User:
+            for kind in ("planets", "species", "people"):
+                touch(kind, session=session)
+        else:
+            touch("users", session=session)
+            touch_name(KIND_OF[type(obj)], obj.id, session=session)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_orm_inserts(session, flush_context):
+    # en after_flush las filas nuevas ya tienen id
+    for obj in session.new:
+        if type(obj) in KIND_OF:
+            touch(KIND_OF[type(obj)], obj.id, session=session, created=True)
+            if type(obj) is not User:
+                touch_name(KIND_OF[type(obj)], obj.id, session=session, created=True)
+        elif type(obj) in IMAGE_KIND_OF:
+            _touch_image(obj, session)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_versions(session):
+    session.flush()
+    kinds = sorted({kind for kind, _ in session.info.get("touched", set()) | session.info.get("created", set())})
+    if not kinds:
+        return
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    session.execute(insert_ignore(session, TableVersion.__table__),
+                    [{"name": kind, "version": 0, "updated_at": now} for kind in kinds])
+    session.execute(
+        update(TableVersion.__table__)
+        .where(TableVersion.name.in_(kinds))
+        .values(version=TableVersion.version + 1, updated_at=now)
+    )
+    session.info["versions"] = dict(session.execute(
+        select(TableVersion.name, TableVersion.version).where(TableVersion.name.in_(kinds))
+    ).all())
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    touched = session.info.pop("touched", set())
+    created = session.info.pop("created", set())
+    versions = session.info.pop("versions", {})
+    profiles = session.info.pop("profiles", False)
+    if has_app_context():
+        changed = {kind: set() for kind, _ in created}
+        for kind, entity_id in touched:
+            # None (todo el tipo) también se pasa: invalida todos los detalles
+            changed.setdefault(kind, set()).add(entity_id)
+        # users y names:* no tienen entradas propias en la caché
+        changed = {kind: ids for kind, ids in changed.items() if kind != "users" and not kind.startswith("names:")}
+        if profiles:
+            changed["users:profiles"] = set()
+        for kind, ids in changed.items():
+            invalidate_many(kind, ids)
+        committed(versions)
+    for hook in COMMIT_HOOKS:
+        hook(touched, created, versions)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched(session):
+    for key in ("touched", "created", "versions", "profiles"):
+        session.info.pop(key, None)
+
+
+def current_versions(kinds):
+    """
+    {kind: (version, updated_at)} leído con una sola consulta por clave primaria,
+    de la misma base (réplica o primario) que el resto de lecturas del request
+    """
+    rows = read_connection().execute(
+        select(TableVersion.name, TableVersion.version, TableVersion.updated_at)
+        .where(TableVersion.name.in_(kinds))
+    )
+    versions = {kind: (0, None) for kind in kinds}
+    for name, version, updated_at in rows:
+        versions[name] = (version, updated_at)
+    return versions
+
+
+def validators(kinds, path, args, accept):
+    """
+    (versions, etag, last_modified) de una lectura de `kinds`; `last_modified`
+    es la hora exacta, la cabecera sale de `header_date`
+    """
+    versions = current_versions(kinds)
+    params = "&".join(f"{k}={v}" for k, v in sorted(args.items(multi=True)))
+    state = f"{path}?{params}|{accept}|" + ",".join(f"{k}:{versions[k][0]}" for k in kinds)
+    etag = hashlib.md5(state.encode()).hexdigest()
+    dates = [updated_at for _, updated_at in versions.values() if updated_at is not None]
+    last_modified = max(dates) if dates else None
+    return versions, etag, last_modified
+
+
+def header_date(last_modified):
+    """
+    Last-Modified para la cabecera (sin microsegundos), o None mientras su
+    segundo no terminó: otra escritura en ese mismo segundo tendría la misma
+    fecha y un If-Modified-Since con ella respondería 304 con datos viejos
+    """
+    if last_modified is None:
+        return None
+    second = last_modified.replace(microsecond=0)
+    if datetime.now(timezone.utc).replace(tzinfo=None).replace(microsecond=0) <= second:
+        return None
+    return second
+
+
+def is_not_modified(etag, last_modified, if_none_match, if_modified_since):
+    if if_none_match:
+        return if_none_match.contains(etag)
+    since = if_modified_since
+    # la cabecera solo se envía con segundos ya cerrados (ver header_date)
+    return bool(since and last_modified and last_modified.replace(microsecond=0) <= since.replace(tzinfo=None))
+
+
+def conditional(*kinds):
+    """
+    Añade ETag y Last-Modified a un GET a partir de las versiones de `kinds`.
+    Si el cliente ya tiene esa versión responde 304 sin ejecutar el handler.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            versions, etag, last_modified = validators(
+                kinds, request.path, request.args, request.headers.get("Accept", "")
+            )
+            # también forma parte de la clave de la caché (ver cache.py)
+            g.table_versions = versions
+
+            if is_not_modified(etag, last_modified, request.if_none_match, request.if_modified_since):
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = header_date(last_modified)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,81 @@
+"""
+Fixtures de la suite: la app corre contra una base SQLite temporal (la
+URL tiene que estar en el entorno antes de importar app) y cada test
+empieza con las tablas recién creadas, unos pocos datos, la caché vacía y
+el índice de autocompletado sin construir.
+
+    $ python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "src"))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix="starwars-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ.setdefault("CACHE_BACKEND", "memory")
+
+from app import app as flask_app  # noqa: E402
+from sqlalchemy import func, select  # noqa: E402
+from models import db, User, Planets, People, Species, FavoriteCount  # noqa: E402
+from cache import catalog_cache  # noqa: E402
+from autocomplete import setup_autocomplete  # noqa: E402
+
+ENTITIES = 12
+
+
+def seed():
+    """Usuarios y entidades numerados desde 1; cada usuario tiene favoritos de los tres tipos"""
+    for i in range(4):
+        db.session.add(User(email=f"user{i}@example.com", password="x", description="test", age=20 + i,
+                            nickname=f"user{i}", is_active=True))
+    for i in range(ENTITIES):
+        db.session.add(Planets(name=f"Planet {i}", description="test", population=i * 1000, climate="arid",
+                               gravity=1, diameter=1000 + i, orbital_period=300, terrain="desert",
+                               rotation_period=24))
+        db.session.add(People(name=f"Person {i}", description="test", height=150 + i, gender="n/a",
+                              birth_year="19BBY", hair_color="brown", mass=70, skin_color="fair"))
+        db.session.add(Species(name=f"Species {i}", description="test", classification="mammal",
+                               language="basic", average_lifespan=80, average_height=170,
+                               designation="sentient", eye_colors="blue", hair_colors="brown"))
+    db.session.commit()
+    for user in db.session.scalars(db.select(User)):
+        # cada entidad termina con una cantidad distinta de fans
+        user.favorite_planets.extend(db.session.get(Planets, i) for i in range(1, ENTITIES + 1, user.id))
+        user.favorite_people.extend(db.session.get(People, i) for i in range(1, ENTITIES + 1, user.id))
+        user.favorite_species.extend(db.session.get(Species, i) for i in range(1, ENTITIES + 1, user.id))
+    db.session.commit()
+
+
+def favorite_rows(table, column, entity_id):
+    return db.session.execute(
+        select(func.count()).select_from(table).where(table.c[column] == entity_id)
+    ).scalar()
+
+
+def counted_fans(kind, entity_id):
+    row = db.session.get(FavoriteCount, (kind, entity_id))
+    return None if row is None else row.fans
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True)
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        seed()
+        catalog_cache().backend.clear()
+        catalog_cache().known.clear()
+        setup_autocomplete(flask_app)
+        db.session.remove()
+    yield flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
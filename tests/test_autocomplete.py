@@ -0,0 +1,106 @@
+"""
+Autocompletado: coincidencias por cualquier palabra del nombre, el índice
+sigue las altas, ediciones y bajas, y solo se recarga cuando otro worker
+cambia nombres (no con favoritos), en un hilo aparte.
+"""
+import sqlite3
+from conftest import DB_PATH
+from models import db, TableVersion
+
+PLANET = {
+    "name": "Tatooine Prime", "description": "test", "population": 200000, "climate": "arid", "gravity": 1,
+    "diameter": 10465, "orbital_period": 304, "terrain": "desert", "rotation_period": 23,
+}
+
+
+def names(client, query):
+    response = client.get(f"/autocomplete?{query}")
+    assert response.status_code == 200, response.get_json()
+    return [(item["kind"], item["name"]) for item in response.get_json()["results"]]
+
+
+def names_version(app, kind):
+    with app.app_context():
+        row = db.session.get(TableVersion, f"names:{kind}")
+        return None if row is None else row.version
+
+
+def test_matches_any_word_ignoring_case_and_accents(client):
+    client.patch("/planet/1", json={"name": "Ándor Major"})
+    assert names(client, "prefix=and") == [("planets", "Ándor Major")]
+    assert names(client, "prefix=MAJ") == [("planets", "Ándor Major")]
+
+
+def test_kinds_and_limit(client):
+    assert names(client, "prefix=planet 1&limit=50") == [("planets", "Planet 1"), ("planets", "Planet 10"),
+                                                          ("planets", "Planet 11")]
+    assert {kind for kind, _ in names(client, "prefix=p&limit=50")} == {"planets", "people"}
+    assert names(client, "prefix=p&kinds=people&limit=2") == [("people", "Person 0"), ("people", "Person 1")]
+
+
+def test_follows_writes_of_this_process(client):
+    assert names(client, "prefix=tatooine") == []
+    planet_id = client.post("/planet", json=PLANET).get_json()["planet"]["id"]
+    assert names(client, "prefix=tatooine") == [("planets", "Tatooine Prime")]
+    client.patch(f"/planet/{planet_id}", json={"name": "Hoth"})
+    assert names(client, "prefix=tatooine") == []
+    assert names(client, "prefix=hoth") == [("planets", "Hoth")]
+    client.delete(f"/planet/{planet_id}")
+    assert names(client, "prefix=hoth") == []
+
+
+def test_follows_bulk_loads_and_deletes(client):
+    names(client, "prefix=x")
+    rows = [dict(PLANET, name=f"Kamino {i}") for i in range(3)]
+    assert client.post("/planets/bulk", json=rows).status_code == 201
+    assert len(names(client, "prefix=kamino")) == 3
+    client.delete("/planets?ids=1,2")
+    assert ("planets", "Planet 1") not in names(client, "prefix=planet&limit=50")
+
+
+def test_bulk_load_without_returning_reloads_the_kind(app, client, monkeypatch):
+    # como en MySQL: el executemany no devuelve los ids de las filas nuevas
+    with app.app_context():
+        monkeypatch.setattr(db.engine.dialect, "insert_executemany_returning", False)
+    names(client, "prefix=x")
+    rows = [dict(PLANET, name=f"Kamino {i}") for i in range(3)]
+    assert client.post("/planets/bulk", json=rows).status_code == 201
+    names(client, "prefix=kamino")
+    thread = app.extensions["autocomplete"].indexes["planets"].rebuilding
+    if thread is not None:
+        thread.join(5)
+    assert len(names(client, "prefix=kamino")) == 3
+    assert client.get("/planets?name__prefix=Kamino").get_json()["results"]
+
+
+def test_favorites_and_other_columns_do_not_touch_names(app, client):
+    names(client, "prefix=planet")
+    before = names_version(app, "planets")
+    client.post("/favorite/planet/3", json={"user_id": 2})
+    client.patch("/planet/3", json={"climate": "frozen"})
+    assert names_version(app, "planets") == before
+
+
+def test_writes_of_other_workers_reload_in_background(app, client):
+    autocomplete = app.extensions["autocomplete"]
+    autocomplete.sync_interval = 0
+    assert names(client, "prefix=dagobah") == []
+
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.execute("UPDATE planets SET name = 'Dagobah' WHERE id = 4")
+        conn.execute("UPDATE table_version SET version = version + 1 WHERE name = 'names:planets'")
+    conn.close()
+
+    # mientras se recarga responde el índice anterior
+    assert names(client, "prefix=dagobah") in ([], [("planets", "Dagobah")])
+    thread = autocomplete.indexes["planets"].rebuilding
+    if thread is not None:
+        thread.join(5)
+    assert names(client, "prefix=dagobah") == [("planets", "Dagobah")]
+
+
+def test_bad_queries_are_400(client):
+    assert client.get("/autocomplete").status_code == 400
+    assert client.get("/autocomplete?prefix=a&kinds=ships").status_code == 400
+    assert client.get("/autocomplete?prefix=a&limit=x").status_code == 400
@@ -0,0 +1,96 @@
+"""
+Carga masiva (/planets/bulk, /people/bulk, /species/bulk): se valida todo el
+payload antes de escribir, se inserta o actualiza por bloques y, si un
+bloque falla, el reporte dice cuántos quedaron guardados.
+"""
+import pytest
+from sqlalchemy import select, text
+from conftest import ENTITIES
+from models import db, Planets
+
+PLANET = {
+    "name": "Kamino", "description": "test", "population": 1000, "climate": "rainy", "gravity": 1,
+    "diameter": 19720, "orbital_period": 463, "terrain": "ocean", "rotation_period": 27,
+}
+PERSON = {
+    "name": "Jango Fett", "description": "test", "height": 183, "gender": "male", "birth_year": "66BBY",
+    "hair_color": "black", "mass": 79, "skin_color": "tan",
+}
+
+
+def planet_names(app):
+    with app.app_context():
+        return db.session.execute(select(Planets.name).order_by(Planets.id)).scalars().all()
+
+
+def test_insert_in_chunks(app, client):
+    rows = [dict(PLANET, name=f"Kamino {i}") for i in range(5)]
+    response = client.post("/planets/bulk?chunk_size=2", json=rows)
+    assert response.status_code == 201, response.get_json()
+    report = response.get_json()
+    assert (report["inserted"], report["updated"], report["chunks"], report["chunk_size"]) == (5, 0, 3, 2)
+    assert planet_names(app)[ENTITIES:] == [row["name"] for row in rows]
+    # las listas ya ven las filas nuevas
+    assert len(client.get("/planets?name__prefix=Kamino").get_json()["results"]) == 5
+
+
+def test_ndjson_payload(client):
+    lines = "\n".join(f'{{"name": "Boba {i}", "description": "test", "height": 183, "gender": "male", '
+                      f'"birth_year": "31BBY", "hair_color": "black", "mass": 78, "skin_color": "tan"}}'
+                      for i in range(3))
+    response = client.post("/people/bulk", data=lines + "\n\n", content_type="application/x-ndjson")
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()["inserted"] == 3
+
+
+def test_upsert_updates_by_name(app, client):
+    rows = [dict(PLANET, name="Planet 1", climate="frozen"), dict(PLANET, name="Kamino"),
+            dict(PLANET, name="Kamino", climate="stormy")]
+    report = client.post("/planets/bulk?mode=upsert", json=rows).get_json()
+    assert (report["inserted"], report["updated"]) == (1, 1)
+    assert client.get("/planets/2?fields=climate").get_json()["climate"] == "frozen"
+    # con nombres repetidos en el payload gana el último
+    kamino = client.get("/planets?name=Kamino&fields=climate").get_json()["results"]
+    assert [planet["climate"] for planet in kamino] == ["stormy"]
+
+
+@pytest.mark.parametrize("rows, message", [
+    ([dict(PLANET, population="many")], "population"),
+    ([dict(PLANET, gravity=True)], "gravity"),
+    ([{key: value for key, value in PLANET.items() if key != "terrain"}], "terrain"),
+    (["Kamino"], "objeto"),
+])
+def test_invalid_rows_are_400_and_nothing_is_written(app, client, rows, message):
+    response = client.post("/planets/bulk", json=[PLANET] + rows)
+    assert response.status_code == 400
+    errors = response.get_json()["errors"]
+    assert [error["row"] for error in errors] == [1]
+    assert message in errors[0]["msg"]
+    assert len(planet_names(app)) == ENTITIES
+
+
+@pytest.mark.parametrize("query", ["mode=merge", "chunk_size=0", "chunk_size=x"])
+def test_bad_options_are_400(client, query):
+    assert client.post(f"/planets/bulk?{query}", json=[PLANET]).status_code == 400
+
+
+def test_bad_payload_is_400(client):
+    assert client.post("/planets/bulk", json={"rows": [PLANET]}).status_code == 400
+    assert client.post("/people/bulk", data='{"name": "x"\n', content_type="application/x-ndjson").status_code == 400
+    assert client.post("/species/bulk", json=[PERSON]).status_code == 400
+
+
+def test_failed_chunk_reports_what_was_saved(app, client):
+    with app.app_context():
+        # la base rechaza una fila que pasó la validación
+        db.session.execute(text(
+            "CREATE TRIGGER reject_planet BEFORE INSERT ON planets WHEN NEW.name = 'Kamino 3' "
+            "BEGIN SELECT RAISE(ABORT, 'rechazada'); END"
+        ))
+        db.session.commit()
+    rows = [dict(PLANET, name=f"Kamino {i}") for i in range(6)]
+    response = client.post("/planets/bulk?chunk_size=2", json=rows)
+    assert response.status_code == 500
+    report = response.get_json()
+    assert (report["inserted"], report["chunks"], report["failed_chunk"], report["rows_committed"]) == (2, 1, 1, 2)
+    assert planet_names(app)[ENTITIES:] == ["Kamino 0", "Kamino 1"]
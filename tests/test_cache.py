@@ -0,0 +1,152 @@
+"""
+Caché del catálogo y GET condicionales: una escritura, por la API o desde
+otra conexión, invalida el cuerpo guardado y el ETag; sin escrituras se
+responde 304.
+"""
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from conftest import DB_PATH
+from models import db, User
+from versions import header_date, is_not_modified
+
+PLANET = {
+    "name": "Tatooine", "description": "test", "population": 200000, "climate": "arid", "gravity": 1,
+    "diameter": 10465, "orbital_period": 304, "terrain": "desert", "rotation_period": 23,
+}
+
+
+def cache_hits(client):
+    return client.get("/cache/stats").get_json()["hits"]
+
+
+def test_repeated_get_is_served_from_cache(client):
+    first = client.get("/planets?limit=5")
+    hits = cache_hits(client)
+    second = client.get("/planets?limit=5")
+    assert second.data == first.data
+    assert cache_hits(client) == hits + 1
+
+
+def test_patch_invalidates_list_and_detail(client):
+    client.get("/planets?limit=5&fields=name")
+    client.get("/planets/1?fields=name")
+    assert client.patch("/planet/1", json={"name": "Hoth"}).status_code == 200
+    assert client.get("/planets?limit=5&fields=name").get_json()["results"][0]["name"] == "Hoth"
+    assert client.get("/planets/1?fields=name").get_json()["name"] == "Hoth"
+
+
+def test_put_invalidates_detail(client):
+    client.get("/planets/2")
+    assert client.put("/planet/2", json=PLANET).status_code == 200
+    assert client.get("/planets/2").get_json()["name"] == "Tatooine"
+
+
+def test_favorite_invalidates_fans(client):
+    assert client.get("/people/2?fans=count").get_json()["fans_count"] == 1
+    assert client.post("/favorite/people/2", json={"user_id": 2}).get_json()["changed"] is True
+    assert client.get("/people/2?fans=count").get_json()["fans_count"] == 2
+    assert client.delete("/favorite/people/2", json={"user_id": 1}).get_json()["changed"] is True
+    assert client.get("/people/2?fans=ids").get_json()["fans"] == [2]
+
+
+def test_unrelated_writes_keep_detail_cached(client):
+    client.get("/planets/5")
+    client.patch("/planet/9", json={"climate": "frozen"})
+    client.post("/favorite/people/2", json={"user_id": 2})
+    client.post("/favorite/planet/6", json={"user_id": 2})
+    hits = cache_hits(client)
+    client.get("/planets/5")
+    assert cache_hits(client) == hits + 1
+
+
+def test_new_rows_invalidate_lists_only(client):
+    client.get("/planets/5")
+    client.get("/planets?limit=50&fields=name")
+    assert client.post("/planet", json=PLANET).status_code == 201
+    names = [item["name"] for item in client.get("/planets?limit=50&fields=name").get_json()["results"]]
+    assert names[-1] == "Tatooine"
+    hits = cache_hits(client)
+    client.get("/planets/5")
+    assert cache_hits(client) == hits + 1
+
+
+def test_user_edits_reach_full_fans(app, client):
+    client.get("/planets/1")
+    client.get("/planets/1?fans=ids")
+    with app.app_context():
+        db.session.get(User, 2).nickname = "renamed"
+        db.session.commit()
+    assert "renamed" in [fan["nickname"] for fan in client.get("/planets/1").get_json()["fans"]]
+    # los ids no cambiaron: esa entrada sigue en caché
+    hits = cache_hits(client)
+    client.get("/planets/1?fans=ids")
+    assert cache_hits(client) == hits + 1
+
+
+def test_user_delete_reaches_fans(app, client):
+    assert client.get("/planets/1?fans=ids").get_json()["fans"] == [1, 2, 3, 4]
+    with app.app_context():
+        db.session.delete(db.session.get(User, 4))
+        db.session.commit()
+    assert client.get("/planets/1?fans=ids").get_json()["fans"] == [1, 2, 3]
+
+
+def test_memory_cache_sees_writes_from_other_workers(app, client):
+    if app.extensions["catalog_cache"].backend.shared:
+        pytest.skip("la caché compartida la invalidan los propios workers")
+    before = client.get("/planets/3")
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        # lo que haría otro worker: la fila y su versión de tabla en la misma transacción
+        conn.execute("UPDATE planets SET name = 'Dagobah' WHERE id = 3")
+        conn.execute("UPDATE table_version SET version = version + 1 WHERE name = 'planets'")
+    conn.close()
+    after = client.get("/planets/3")
+    assert after.get_json()["name"] == "Dagobah"
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+
+def test_if_none_match_is_304_until_a_write(client):
+    etag = client.get("/planets/4").headers["ETag"]
+    not_modified = client.get("/planets/4", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b""
+    assert not_modified.headers["ETag"] == etag
+
+    client.patch("/planet/4", json={"climate": "frozen"})
+    changed = client.get("/planets/4", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()["climate"] == "frozen"
+
+
+def test_if_none_match_on_lists(client):
+    etag = client.get("/species?limit=3").headers["ETag"]
+    assert client.get("/species?limit=3", headers={"If-None-Match": etag}).status_code == 304
+    client.post("/favorite/species/3", json={"user_id": 4})
+    assert client.get("/species?limit=3", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_if_modified_since(client):
+    conn = sqlite3.connect(DB_PATH)
+    with conn:
+        conn.execute("UPDATE table_version SET updated_at = datetime('now', '-1 minute')")
+    conn.close()
+    last_modified = client.get("/planets/5").headers["Last-Modified"]
+    assert client.get("/planets/5", headers={"If-Modified-Since": last_modified}).status_code == 304
+    client.patch("/planet/5", json={"name": "Naboo"})
+    response = client.get("/planets/5", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert response.get_json()["name"] == "Naboo"
+
+
+def test_last_modified_waits_for_its_second_to_end(app):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    # otra escritura en este mismo segundo tendría la misma fecha
+    assert header_date(now) is None
+    assert header_date(now - timedelta(seconds=2)) == (now - timedelta(seconds=2)).replace(microsecond=0)
+    written = datetime(2024, 5, 4, 12, 0, 0, 700000)
+    assert is_not_modified("etag", written, None, datetime(2024, 5, 4, 12, 0, 0, tzinfo=timezone.utc))
+    assert not is_not_modified("etag", written, None, datetime(2024, 5, 4, 11, 59, 59, tzinfo=timezone.utc))
@@ -0,0 +1,66 @@
+"""
+Cantidad de consultas de las rutas de lectura del catálogo (cabecera
+X-Query-Count): los fans se cargan por lotes, así que la cuenta no puede
+crecer con el tamaño de la página ni depender de cuántos fans haya.
+"""
+import pytest
+from conftest import ENTITIES
+
+ROUTES = ["/planets", "/people", "/species"]
+FANS_MODES = ["none", "count", "ids", "full"]
+PAGE_SIZES = [1, 5, ENTITIES]
+
+
+def query_count(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return int(response.headers["X-Query-Count"])
+
+
+@pytest.mark.parametrize("route", ROUTES)
+@pytest.mark.parametrize("fans", FANS_MODES)
+def test_list_query_count_does_not_grow_with_page_size(client, route, fans):
+    counts = {size: query_count(client, f"{route}?limit={size}&fans={fans}") for size in PAGE_SIZES}
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_list_query_count_is_bounded_with_images(client, route):
+    counts = {size: query_count(client, f"{route}?limit={size}&fans=full&images=1") for size in PAGE_SIZES}
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_list_query_count_is_the_same_on_later_pages(client, route):
+    first = client.get(f"{route}?limit=3&fans=ids")
+    cursor = first.get_json()["next"]
+    assert cursor
+    assert query_count(client, f"{route}?limit=3&fans=ids&after={cursor}") == int(first.headers["X-Query-Count"])
+
+
+@pytest.mark.parametrize("route", ROUTES)
+@pytest.mark.parametrize("fans", FANS_MODES)
+def test_detail_query_count_does_not_depend_on_fans(client, route, fans):
+    # la entidad 1 tiene un fan por usuario; la última, solo el del usuario 1
+    counts = {entity_id: query_count(client, f"{route}/{entity_id}?fans={fans}") for entity_id in (1, 2, ENTITIES)}
+    assert len(set(counts.values())) == 1, counts
+
+
+@pytest.mark.parametrize("route", ROUTES)
+def test_fans_modes_agree(client, route):
+    full = client.get(f"{route}?limit={ENTITIES}&fans=full").get_json()["results"]
+    ids = client.get(f"{route}?limit={ENTITIES}&fans=ids").get_json()["results"]
+    count = client.get(f"{route}?limit={ENTITIES}&fans=count").get_json()["results"]
+    for full_item, ids_item, count_item in zip(full, ids, count):
+        assert [fan["id"] for fan in full_item["fans"]] == ids_item["fans"]
+        assert count_item["fans_count"] == len(ids_item["fans"])
+    assert ids[0]["fans"] == [1, 2, 3, 4]
+
+
+def test_unknown_entity_is_404(client):
+    assert client.get(f"/planets/{ENTITIES + 1}").status_code == 404
+
+
+@pytest.mark.parametrize("query", ["after=!!!", "fans=all", "limit=x", "sort=nope"])
+def test_bad_query_is_400(client, query):
+    assert client.get(f"/planets?{query}").status_code == 400
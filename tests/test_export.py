@@ -0,0 +1,57 @@
+"""
+Exportación en NDJSON (`Accept: application/x-ndjson` o `?stream=1`): una
+línea por fila con lo mismo que daría la lista paginada, sin paginar.
+"""
+import json
+import pytest
+import catalog
+from conftest import ENTITIES
+
+NDJSON = {"Accept": "application/x-ndjson"}
+
+
+def lines(response):
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize("route", ["/planets", "/people", "/species"])
+def test_export_matches_the_list(client, route):
+    exported = lines(client.get(f"{route}?fans=ids", headers=NDJSON))
+    listed = client.get(f"{route}?fans=ids&limit={ENTITIES}").get_json()["results"]
+    assert exported == listed
+
+
+def test_export_crosses_batches(client, monkeypatch):
+    monkeypatch.setattr(catalog, "STREAM_BATCH", 5)
+    exported = lines(client.get("/people?stream=1&fields=name&fans=count"))
+    assert [person["id"] for person in exported] == list(range(1, ENTITIES + 1))
+    assert exported[0] == {"id": 1, "name": "Person 0", "fans_count": 4}
+
+
+def test_export_applies_filters_sort_and_after(client):
+    exported = lines(client.get("/planets?stream=1&fields=name&population__gte=5000&sort=-population"))
+    assert [planet["name"] for planet in exported] == [f"Planet {i}" for i in range(ENTITIES - 1, 4, -1)]
+    # el campo del orden no se cuela en las filas si no se pidió
+    assert set(exported[0]) == {"id", "name"}
+
+    cursor = client.get("/planets?limit=4").get_json()["next"]
+    assert [planet["id"] for planet in lines(client.get(f"/planets?stream=1&after={cursor}"))] == \
+        list(range(5, ENTITIES + 1))
+
+
+def test_export_users_with_favorites(client):
+    exported = lines(client.get("/users", headers=NDJSON))
+    assert exported == client.get("/users").get_json()["results"]
+    assert [planet["id"] for planet in exported[3]["favorite_planets"]] == list(range(1, ENTITIES + 1, 4))
+
+
+def test_json_is_still_the_default(client):
+    assert client.get("/planets").mimetype == "application/json"
+    assert client.get("/planets", headers={"Accept": "application/json, application/x-ndjson;q=0.5"}).is_json
+
+
+def test_bad_query_is_400_before_streaming(client):
+    assert client.get("/planets?stream=1&sort=nope").status_code == 400
+    assert client.get("/people?stream=1&after=!!!").status_code == 400
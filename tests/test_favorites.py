@@ -0,0 +1,61 @@
+"""
+Favoritos en bloque (/favorites/bulk): un estado por item en el mismo orden
+del request, y los pares que sí cambiaron se escriben en un solo commit.
+"""
+from conftest import counted_fans, favorite_rows
+from favorites import BULK_MAX_ITEMS
+from models import user_planet_favorites, user_species_favorites
+
+
+def statuses(response):
+    assert response.status_code == 200, response.get_json()
+    return [item["status"] for item in response.get_json()["results"]]
+
+
+def test_add_reports_a_status_per_item(app, client):
+    # el usuario 2 ya tiene el planeta 1 y no el 2
+    items = [
+        {"user_id": 2, "kind": "planets", "id": 2},
+        {"user_id": 2, "kind": "planets", "id": 1},
+        {"user_id": 99, "kind": "planets", "id": 2},
+        {"user_id": 2, "kind": "planets", "id": 99},
+        {"user_id": 2, "kind": "ships", "id": 2},
+        {"user_id": "2", "kind": "planets", "id": 2},
+        "planet 2",
+        {"user_id": 2, "kind": "species", "id": 2},
+    ]
+    assert statuses(client.post("/favorites/bulk", json={"items": items})) == [
+        "added", "exists", "user_not_found", "not_found", "invalid", "invalid", "invalid", "added",
+    ]
+    results = client.post("/favorites/bulk", json={"items": items[:1]}).get_json()["results"]
+    assert results == [{"user_id": 2, "kind": "planets", "id": 2, "status": "exists"}]
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 2) == 2
+        assert favorite_rows(user_species_favorites, "species_id", 2) == 2
+        assert counted_fans("planets", 2) == 2
+
+
+def test_remove_reports_a_status_per_item(app, client):
+    items = [
+        {"user_id": 2, "kind": "planets", "id": 1},
+        {"user_id": 2, "kind": "planets", "id": 2},
+        {"user_id": 99, "kind": "planets", "id": 1},
+        {"user_id": 2, "kind": "people", "id": 99},
+    ]
+    assert statuses(client.delete("/favorites/bulk", json={"items": items})) == [
+        "removed", "not_favorite", "user_not_found", "not_found",
+    ]
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 1) == 3
+        assert counted_fans("planets", 1) == 3
+    favorites = client.get("/users/favorites/2").get_json()
+    assert 1 not in [planet["id"] for planet in favorites["planets"]]
+
+
+def test_bad_body_is_400(client):
+    assert client.post("/favorites/bulk", json={"items": "x"}).status_code == 400
+    assert client.post("/favorites/bulk", json=[]).status_code == 400
+    assert client.post("/favorites/bulk", data="x", content_type="application/json").status_code == 400
+    too_many = {"items": [{"user_id": 1, "kind": "planets", "id": 1}] * (BULK_MAX_ITEMS + 1)}
+    assert client.post("/favorites/bulk", json=too_many).status_code == 400
+
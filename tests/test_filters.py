@@ -0,0 +1,92 @@
+"""
+Filtros de las listas del catálogo (`campo=`, `__in`, rangos y `__prefix`),
+orden con `sort=` y cursores que siguen ese orden.
+"""
+from urllib.parse import quote
+import pytest
+from sqlalchemy import and_
+from werkzeug.datastructures import MultiDict
+from catalog import encode_cursor, parse_filters
+from conftest import ENTITIES
+from models import Planets
+
+
+def names(client, query):
+    response = client.get(f"/planets?fields=name&limit=50&{query}")
+    assert response.status_code == 200, response.get_json()
+    return [planet["name"] for planet in response.get_json()["results"]]
+
+
+def walk(client, url):
+    """Recorre todas las páginas siguiendo `next`; devuelve los ids"""
+    ids, cursor = [], None
+    while True:
+        page = client.get(url + (f"&after={cursor}" if cursor else "")).get_json()
+        ids += [item["id"] for item in page["results"]]
+        cursor = page["next"]
+        if cursor is None:
+            return ids
+
+
+def test_equality_in_and_ranges(client):
+    assert names(client, "name=Planet%203") == ["Planet 3"]
+    assert names(client, "name__in=Planet%203,Planet%205,Hoth") == ["Planet 3", "Planet 5"]
+    assert names(client, "population__gte=3000&population__lt=6000") == ["Planet 3", "Planet 4", "Planet 5"]
+    assert names(client, "population__gt=10000") == ["Planet 11"]
+    assert names(client, "population__in=0,2000&climate=arid") == ["Planet 0", "Planet 2"]
+    # los parámetros que no son columnas se ignoran
+    assert len(names(client, "foo=1")) == ENTITIES
+
+
+def test_prefix_filter(client):
+    assert names(client, "name__prefix=Planet%201") == ["Planet 1", "Planet 10", "Planet 11"]
+    assert names(client, "name__prefix=planet") == []
+    # los comodines de LIKE se toman literalmente
+    assert names(client, "name__prefix=Planet%25") == []
+    assert names(client, "name__prefix=Planet_") == []
+
+
+def test_prefix_filter_rechecks_the_range(app):
+    # el rango solo es exacto con collation binaria; el LIKE lo confirma con cualquiera
+    conditions = parse_filters(Planets, MultiDict({"name__prefix": "Planet 1"}))
+    sql = str(and_(*conditions).compile(compile_kwargs={"literal_binds": True}))
+    assert "planets.name >= 'Planet 1'" in sql
+    assert "planets.name < 'Planet 2'" in sql
+    assert "planets.name LIKE 'Planet 1' || '%'" in sql
+
+
+def test_prefix_without_next_character(client):
+    # U+10FFFF no tiene siguiente carácter: solo cota inferior, sin error
+    assert names(client, "name__prefix=" + quote("\U0010ffff")) == []
+    assert names(client, "name__prefix=" + quote("Planet 1\U0010ffff")) == []
+
+
+@pytest.mark.parametrize("sort, expected", [
+    ("population", list(range(1, ENTITIES + 1))),
+    ("-population", list(range(ENTITIES, 0, -1))),
+    # todos tienen el mismo clima: desempata el id
+    ("climate", list(range(1, ENTITIES + 1))),
+    ("-climate", list(range(ENTITIES, 0, -1))),
+    ("-id", list(range(ENTITIES, 0, -1))),
+])
+def test_sort_pages_follow_the_cursor(client, sort, expected):
+    assert walk(client, f"/planets?fields=name&sort={sort}&limit=5") == expected
+
+
+def test_sort_with_filter_and_people(client):
+    assert walk(client, "/people?fields=name&sort=-height&height__lte=155&limit=2") == [6, 5, 4, 3, 2, 1]
+
+
+@pytest.mark.parametrize("query", [
+    "description=x",
+    "population__gt=x",
+    "name__like=a",
+    "sort=description",
+    "sort=population&after=" + encode_cursor(3),
+    "sort=population&after=" + encode_cursor(["x", 3]),
+    "sort=population&after=" + encode_cursor([1000, "3"]),
+    "after=" + encode_cursor([1000, 3]),
+    "after=" + encode_cursor(True),
+])
+def test_bad_filters_sorts_and_cursors_are_400(client, query):
+    assert client.get(f"/planets?{query}").status_code == 400
@@ -0,0 +1,134 @@
+"""
+Lecturas en réplicas: una app aparte con dos réplicas SQLite que tienen otros
+datos que el primario, para ver de dónde leyó cada request. Los GET van a
+una réplica (por turnos), lo demás al primario, y después de escribir la
+cookie `db_primary` manda los GET del cliente al primario.
+"""
+import pytest
+from flask import Flask, jsonify
+from sqlalchemy import insert, select
+from sqlalchemy.exc import OperationalError
+from cache import setup_cache
+from catalog import read
+from models import db, Planets
+from replicas import ReplicaRouter, STICKY_COOKIE, primary, setup_replicas
+
+PLANET = {
+    "id": 1, "description": "test", "population": 0, "climate": "arid", "gravity": 1,
+    "diameter": 1000, "orbital_period": 300, "terrain": "desert", "rotation_period": 24,
+}
+
+
+def make_app(tmp_path, replicas=2, policy="round_robin"):
+    app = Flask(__name__)
+    app.config.update(
+        TESTING=True,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'primary.db'}",
+        DATABASE_REPLICA_URLS=",".join(f"sqlite:///{tmp_path / f'replica{i}.db'}" for i in range(replicas)),
+        DATABASE_REPLICA_POLICY=policy,
+        CACHE_BACKEND="memory",
+    )
+    setup_replicas(app)
+    db.init_app(app)
+    setup_cache(app)
+
+    @app.route("/planet", methods=["GET", "POST"])
+    def planet():
+        return jsonify(read(select(Planets.name).where(Planets.id == 1)).scalar())
+
+    @app.route("/planet/primary")
+    def planet_from_primary():
+        with primary():
+            return jsonify(read(select(Planets.name).where(Planets.id == 1)).scalar())
+
+    @app.route("/planet/rename", methods=["POST"])
+    def rename():
+        db.session.get(Planets, 1).name = "Renamed"
+        db.session.commit()
+        return jsonify("ok")
+
+    with app.app_context():
+        for bind, name in [(None, "Primary")] + [(f"replica_{i}", f"Replica {i}") for i in range(replicas)]:
+            engine = db.engines[bind]
+            db.metadata.create_all(engine)
+            with engine.begin() as conn:
+                conn.execute(insert(Planets.__table__).values(name=name, **PLANET))
+    return app
+
+
+@pytest.fixture(autouse=True)
+def own_metadatas(monkeypatch):
+    # init_app registra una metadata por bind en el `db` compartido; sin esto
+    # el drop_all de los demás tests buscaría las réplicas en la app principal
+    monkeypatch.setattr(db, "metadatas", dict(db.metadatas))
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_gets_rotate_over_replicas(replica_app):
+    client = replica_app.test_client()
+    responses = [client.get("/planet") for _ in range(4)]
+    assert [response.get_json() for response in responses] == ["Replica 0", "Replica 1"] * 2
+    assert [response.headers["X-Read-From"] for response in responses] == ["replica_0", "replica_1"] * 2
+
+
+def test_other_methods_and_primary_blocks_read_the_primary(replica_app):
+    client = replica_app.test_client()
+    response = client.post("/planet")
+    assert (response.get_json(), response.headers["X-Read-From"]) == ("Primary", "primary")
+    assert client.get("/planet/primary").get_json() == "Primary"
+
+
+def test_writes_stick_the_client_to_the_primary(replica_app):
+    client = replica_app.test_client()
+    response = client.post("/planet/rename")
+    assert client.get_cookie(STICKY_COOKIE) is not None
+    assert "Max-Age=5" in response.headers["Set-Cookie"]
+
+    sticky = client.get("/planet")
+    assert (sticky.get_json(), sticky.headers["X-Read-From"]) == ("Renamed", "primary")
+    # otro cliente sin la cookie sigue en las réplicas
+    assert replica_app.test_client().get("/planet").get_json().startswith("Replica")
+
+
+def test_reads_without_writes_do_not_set_the_cookie(replica_app):
+    client = replica_app.test_client()
+    client.get("/planet")
+    client.post("/planet")
+    assert client.get_cookie(STICKY_COOKIE) is None
+
+
+def test_unreachable_replica_falls_back_to_the_primary(replica_app, monkeypatch):
+    with replica_app.app_context():
+        engine = db.engines["replica_0"]
+
+    def refuse():
+        raise OperationalError("connect", {}, Exception("connection refused"))
+    monkeypatch.setattr(engine, "connect", refuse)
+    response = replica_app.test_client().get("/planet")
+    assert (response.get_json(), response.headers["X-Read-From"]) == ("Primary", "primary")
+
+
+def test_least_busy_policy(tmp_path):
+    app = make_app(tmp_path, policy="least_busy")
+    with app.app_context():
+        router = app.extensions["replicas"]
+        busy = db.engines["replica_0"].connect()
+        try:
+            assert router.choose() == "replica_1"
+        finally:
+            busy.close()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        ReplicaRouter(["replica_0"], policy="random")
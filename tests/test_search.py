@@ -0,0 +1,71 @@
+"""
+Búsqueda de texto completo (/search) con el índice FTS5 de SQLite: los
+triggers lo mantienen al día con las escrituras y el nombre pesa más que
+la descripción.
+"""
+import pytest
+from sqlalchemy import text
+import search
+from conftest import ENTITIES
+from models import db
+from search import is_search_object
+
+
+@pytest.fixture
+def client(app):
+    with app.app_context():
+        # drop_all se lleva los triggers pero no la tabla FTS5: se arma de nuevo
+        with db.engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS catalog_search"))
+        search._sqlite_ready.clear()
+        search.ensure_sqlite_index(db.engine)
+    return app.test_client()
+
+
+def hits(client, query):
+    response = client.get(f"/search?{query}")
+    assert response.status_code == 200, response.get_json()
+    return [(item["kind"], item["id"]) for item in response.get_json()["results"]]
+
+
+def test_finds_existing_rows_by_word_and_prefix(client):
+    assert hits(client, "q=planet 3") == [("planets", 4)]
+    assert sorted(hits(client, "q=spec&kinds=species&limit=50")) == [("species", i) for i in range(1, ENTITIES + 1)]
+    assert set(kind for kind, _ in hits(client, "q=test&limit=100")) == {"people", "planets", "species"}
+
+
+def test_name_ranks_above_description(client):
+    client.patch("/planet/1", json={"name": "Naboo"})
+    client.patch("/people/2", json={"description": "born on naboo"})
+    assert hits(client, "q=naboo") == [("planets", 1), ("people", 2)]
+
+
+def test_index_follows_writes(client):
+    client.patch("/planet/3", json={"name": "Mustafar"})
+    assert hits(client, "q=mustafar") == [("planets", 3)]
+    assert ("planets", 3) not in hits(client, "q=planet 2")
+    client.delete("/planet/3")
+    assert hits(client, "q=mustafar") == []
+    client.delete("/species?ids=1,2")
+    assert {("species", 1), ("species", 2)}.isdisjoint(hits(client, "q=species&limit=50"))
+
+
+def test_accents_and_operators_are_plain_words(client):
+    client.patch("/planet/1", json={"name": "Ándor"})
+    assert hits(client, "q=andor") == [("planets", 1)]
+    assert hits(client, 'q=andor" OR "planet') == []
+
+
+@pytest.mark.parametrize("query", ["", "q=", "q=!!!", "q=planet&kinds=ships", "q=planet&limit=x"])
+def test_bad_queries_are_400(client, query):
+    assert client.get(f"/search?{query}").status_code == 400
+
+
+def test_autogenerate_skips_search_objects():
+    assert is_search_object("catalog_search", "table")
+    assert is_search_object("catalog_search_idx", "table")
+    assert is_search_object("search_vector", "column")
+    assert is_search_object("ix_planets_search_vector", "index")
+    assert not is_search_object("planets", "table")
+    assert not is_search_object("name", "column")
+    assert not is_search_object("ix_planets_name", "index")
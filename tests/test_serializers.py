@@ -0,0 +1,46 @@
+"""
+JSON de las respuestas: jsonify (y los cuerpos de error) pasan por orjson
+cuando la salida es compacta, con el mismo contenido que el json estándar.
+"""
+import json
+import pytest
+import serializers
+
+orjson = pytest.importorskip("orjson")
+
+
+@pytest.fixture
+def orjson_calls(monkeypatch):
+    calls = []
+    original = orjson.dumps
+
+    def counting(*args, **kwargs):
+        calls.append(args[0])
+        return original(*args, **kwargs)
+    monkeypatch.setattr(serializers.orjson, "dumps", counting)
+    return calls
+
+
+@pytest.mark.parametrize("url", [
+    "/users", "/autocomplete?prefix=planet", "/favorites/top?kind=planets", "/images/planets?ids=1,2",
+    "/planets?limit=x",
+])
+def test_jsonify_uses_orjson(client, orjson_calls, url):
+    response = client.get(url)
+    assert orjson_calls
+    assert response.get_json() is not None
+
+
+def test_same_content_as_the_standard_encoder(app):
+    payload = {"b": [1, 2.5, None], "a": "núm", "c": {"z": True, "y": "x"}}
+    with app.app_context():
+        text = app.json.dumps(payload, separators=(",", ":"), indent=None)
+        assert json.loads(text) == payload
+        assert list(json.loads(text)) == ["a", "b", "c"]
+
+
+def test_pretty_output_falls_back_to_the_standard_encoder(app, orjson_calls):
+    with app.app_context():
+        text = app.json.dumps({"a": 1}, indent=2)
+    assert text == '{\n  "a": 1\n}'
+    assert not orjson_calls
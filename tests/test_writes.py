@@ -0,0 +1,145 @@
+"""
+Escrituras: reintentos con Idempotency-Key, PATCH con concurrencia optimista
+y borrados de entidades, cuyos favoritos y contadores se van en cascada.
+"""
+from conftest import counted_fans, favorite_rows
+from models import user_planet_favorites, user_people_favorites
+
+
+# Idempotency-Key
+
+def test_retry_replays_the_stored_response(client):
+    headers = {"Idempotency-Key": "add-planet-2"}
+    first = client.post("/favorite/planet/2", json={"user_id": 2}, headers=headers)
+    assert first.get_json()["changed"] is True
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = client.post("/favorite/planet/2", json={"user_id": 2}, headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.status_code == first.status_code
+    assert retry.get_json() == first.get_json()
+
+    # sin la clave el endpoint sí se ejecuta de nuevo
+    again = client.post("/favorite/planet/2", json={"user_id": 2})
+    assert again.get_json()["changed"] is False
+
+
+def test_retry_of_bulk_is_not_applied_twice(app, client):
+    body = {"items": [{"user_id": 2, "kind": "planets", "id": 3}, {"user_id": 2, "kind": "people", "id": 3}]}
+    headers = {"Idempotency-Key": "bulk-1"}
+    first = client.delete("/favorites/bulk", json=body, headers=headers)
+    assert [item["status"] for item in first.get_json()["results"]] == ["removed", "removed"]
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 3) == 1
+    client.post("/favorites/bulk", json=body)
+    retry = client.delete("/favorites/bulk", json=body, headers=headers)
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 3) == 2
+
+
+def test_key_reused_for_another_request_is_422(client):
+    headers = {"Idempotency-Key": "reused"}
+    client.post("/favorite/planet/2", json={"user_id": 2}, headers=headers)
+    assert client.post("/favorite/planet/2", json={"user_id": 3}, headers=headers).status_code == 422
+    assert client.post("/favorite/planet/3", json={"user_id": 2}, headers=headers).status_code == 422
+    assert client.delete("/favorite/planet/2", json={"user_id": 2}, headers=headers).status_code == 422
+
+
+def test_empty_key_is_400(client):
+    assert client.post("/favorite/planet/2", json={"user_id": 2}, headers={"Idempotency-Key": ""}).status_code == 400
+
+
+# PATCH
+
+def test_patch_returns_the_new_version(client):
+    response = client.patch("/planet/1", json={"climate": "frozen"})
+    assert response.status_code == 200
+    planet = response.get_json()["planet"]
+    assert planet["climate"] == "frozen"
+    assert response.headers["X-Entity-Version"] == str(planet["version"])
+
+
+def test_patch_with_stale_version_is_409(client):
+    version = client.patch("/planet/1", json={"climate": "frozen"}).get_json()["planet"]["version"]
+    assert client.patch("/planet/1", json={"name": "Hoth", "version": version}).status_code == 200
+
+    stale = client.patch("/planet/1", json={"name": "Endor", "version": version})
+    assert stale.status_code == 409
+    assert stale.get_json()["version"] == version + 1
+    assert client.get("/planets/1").get_json()["name"] == "Hoth"
+
+
+def test_patch_minimal_is_204(client):
+    response = client.patch("/people/1", json={"height": 180}, headers={"Prefer": "return=minimal"})
+    assert response.status_code == 204
+    assert response.data == b""
+    assert response.headers["X-Entity-Version"]
+
+
+def test_patch_errors(client):
+    assert client.patch("/planet/999", json={"name": "Nowhere"}).status_code == 404
+    assert client.patch("/planet/1", json={"moons": 3}).status_code == 400
+    assert client.patch("/planet/1", json={"version": "1", "name": "x"}).status_code == 400
+    assert client.patch("/planet/1", json={"name": None}).status_code == 400
+
+
+def test_patch_rejects_wrong_types(client):
+    for body in ({"population": "many"}, {"population": True}, {"name": 7}, {"gravity": [1]}):
+        response = client.patch("/planet/1", json=body)
+        assert response.status_code == 400, body
+    assert client.get("/planets/1?fields=population").get_json()["population"] == 0
+
+
+# borrados en cascada
+
+def test_delete_entity_cascades_to_favorites(app, client):
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 1) == 4
+        assert counted_fans("planets", 1) == 4
+
+    assert client.delete("/planet/1").status_code == 201
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 1) == 0
+        assert counted_fans("planets", 1) is None
+    favorites = client.get("/users/favorites/1").get_json()
+    assert 1 not in [planet["id"] for planet in favorites["planets"]]
+    assert client.get("/planets/1").status_code == 404
+
+
+def test_bulk_delete_cascades_to_favorites(app, client):
+    response = client.delete("/people?ids=1,3,999")
+    assert response.status_code == 200
+    with app.app_context():
+        assert favorite_rows(user_people_favorites, "person_id", 1) == 0
+        assert favorite_rows(user_people_favorites, "person_id", 3) == 0
+        assert favorite_rows(user_people_favorites, "person_id", 2) == 1
+        assert counted_fans("people", 1) is None
+    top = client.get("/favorites/top?kind=people").get_json()["results"]
+    assert {1, 3}.isdisjoint(item["id"] for item in top)
+
+
+def test_top_favorites_follow_favorite_changes(client):
+    client.post("/favorite/species/12", json={"user_id": 2})
+    client.post("/favorite/species/12", json={"user_id": 3})
+    top = {item["id"]: item["fans"] for item in client.get("/favorites/top?kind=species&limit=50").get_json()["results"]}
+    assert top[12] == 3
+    client.delete("/favorite/species/12", json={"user_id": 3})
+    top = {item["id"]: item["fans"] for item in client.get("/favorites/top?kind=species&limit=50").get_json()["results"]}
+    assert top[12] == 2
+
+
+def test_duplicate_bulk_items_count_once(app, client):
+    # el planeta 2 solo tiene de fan al usuario 1
+    item = {"user_id": 2, "kind": "planets", "id": 2}
+    added = client.post("/favorites/bulk", json={"items": [item, item]}).get_json()["results"]
+    assert [result["status"] for result in added] == ["added", "exists"]
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 2) == 2
+        assert counted_fans("planets", 2) == 2
+
+    removed = client.delete("/favorites/bulk", json={"items": [item, item]}).get_json()["results"]
+    assert [result["status"] for result in removed] == ["removed", "not_favorite"]
+    with app.app_context():
+        assert favorite_rows(user_planet_favorites, "planet_id", 2) == 1
+        assert counted_fans("planets", 2) == 1